@@ -0,0 +1,100 @@
+"""
+Level generation on a worker thread, for the GUI.
+
+Unique-solution levels can take minutes to generate: every candidate partition
+is searched for a second tiling (see solver.generate_random_pieces). Levels of
+a given difficulty are searched by scoring candidates in a process pool (see
+difficulty.generate_for_difficulty), created from a "spawn" context: forking
+the GUI process would copy its SDL state and its threads into the workers.
+The GUI starts a BackgroundGenerator instead of blocking its render loop, and
+like the progress snapshots of background_solver, the outcome is published as a
+single attribute once the worker is done, so it can be polled every frame.
+"""
+import multiprocessing
+import threading
+
+from difficulty import generate_for_difficulty
+from solver import SolverCancelled, generate_level, make_level_id
+
+
+class GeneratedLevel:
+    """
+    Outcome of a background generation.
+
+    Attributes:
+        level_id (str): ID of the level, or None if the difficulty search failed.
+        pieces (list): Piece objects of the level, or None if generation failed.
+        difficulty (float): Difficulty score of the level, when it was searched by difficulty.
+        error (Exception): Why generation failed (e.g. solver.GenerationError), or None.
+    """
+    __slots__ = ('level_id', 'pieces', 'difficulty', 'error')
+
+    def __init__(self, level_id, pieces=None, difficulty=None, error=None):
+        self.level_id = level_id
+        self.pieces = pieces
+        self.difficulty = difficulty
+        self.error = error
+
+
+class BackgroundGenerator:
+    """
+    Generates one level on a daemon thread.
+    """
+    def __init__(self, level_id=None, side=None, difficulty=None, unique=False):
+        """
+        Prepare a generation. Nothing runs until start() is called.
+
+        Args:
+            level_id (str, optional): Level to generate (see solver.make_level_id).
+                If None, a level of the given side and difficulty is searched first.
+            side (int, optional): Board side of the searched level.
+            difficulty (str, optional): Difficulty band of the searched level (a key
+                of difficulty.DIFFICULTY_BANDS).
+            unique (bool): Search a level with a single solution.
+        """
+        self.level_id = level_id
+        self.side = side
+        self.difficulty = difficulty
+        self.unique = unique
+        self.result = None # GeneratedLevel, once the worker is done
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start the worker thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="hexed-generator", daemon=True)
+        self._thread.start()
+
+    def cancel(self, timeout=1.0):
+        """
+        Ask the worker to stop and wait for it to finish. No result is published.
+
+        Args:
+            timeout (float): Maximum time to wait for the thread, in seconds.
+        """
+        self._cancel_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        level_id, difficulty = self.level_id, None
+        try:
+            if level_id is None:
+                score = generate_for_difficulty(
+                    self.side, self.difficulty, unique=self.unique,
+                    mp_context=multiprocessing.get_context('spawn'), cancel_event=self._cancel_event
+                )
+                if score is None:
+                    print(f"Warning: no {self.difficulty} level found, using a random one.")
+                    level_id = make_level_id(self.side, unique=self.unique)
+                else:
+                    level_id, difficulty = score.level_id, score.difficulty
+            _, pieces = generate_level(level_id, cancel_event=self._cancel_event)
+            result = GeneratedLevel(level_id, pieces, difficulty)
+        except SolverCancelled:
+            return
+        except Exception as e: # Handed to the GUI, like the errors of BackgroundSolver
+            result = GeneratedLevel(level_id, error=e)
+        self.result = result
@@ -0,0 +1,136 @@
+"""
+Solver running on a worker thread, for the GUI.
+
+The worker owns its own board and piece copies, so the render thread never
+touches data that is being searched. Progress is published as immutable
+SolverProgress snapshots: replacing the `progress` attribute is atomic, so the
+GUI can read the latest snapshot every frame without locking.
+"""
+import threading
+import time
+
+from solver import TRANSPOSITION_SIZE, HexBoard, SolverCancelled, copy_pieces, make_solver
+
+
+class SolverProgress:
+    """
+    Immutable snapshot of a running (or finished) background solve.
+
+    Attributes:
+        placements (tuple): (piece id, shape, anchor parity, (row, col)) of every
+            piece placed by the solver in the current branch, in placement order.
+        nodes (int): Number of nodes explored so far.
+        backtracks (int): Number of placements undone so far.
+        depth (int): Number of pieces placed in the current branch.
+        elapsed (float): CPU time spent by the worker thread so far, in seconds.
+        done (bool): True once the search is over (solved, exhausted, cancelled or failed).
+        solved (bool): True if a solution was found.
+        error (Exception): The exception that ended the search, if it failed.
+        version (int): Increases with every published snapshot.
+    """
+    __slots__ = ('placements', 'nodes', 'backtracks', 'depth', 'elapsed', 'done', 'solved', 'error', 'version')
+
+    def __init__(self, placements=(), nodes=0, backtracks=0, elapsed=0.0, done=False, solved=False, error=None,
+                 version=0):
+        self.placements = placements
+        self.nodes = nodes
+        self.backtracks = backtracks
+        self.depth = len(placements)
+        self.elapsed = elapsed
+        self.done = done
+        self.solved = solved
+        self.error = error
+        self.version = version
+
+    @property
+    def nodes_per_sec(self):
+        """
+        Average search speed so far.
+        """
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class BackgroundSolver:
+    """
+    Runs one solve on a daemon thread and publishes SolverProgress snapshots.
+    """
+    def __init__(self, side, pieces, strategy='backtrack', prune=False, all_orientations=False, profile=False,
+                 transposition_size=TRANSPOSITION_SIZE, flips=False):
+        """
+        Prepare a solve. Nothing runs until start() is called.
+
+        Args:
+            side (int): Side of the board to solve.
+            pieces (list): Piece objects. They are copied, the originals are never modified.
+            strategy (str): A key of SOLVER_STRATEGIES.
+            prune (bool): Enable dead-region pruning.
+            all_orientations (bool): Let the solver rotate and reflect the pieces.
+            profile (bool): Collect per-depth and per-piece statistics in solver.stats.
+            transposition_size (int): Capacity of the solver table of dead states (0 disables it).
+            flips (bool): Let the solver flip the pieces like the player can.
+        """
+        self.board = HexBoard(side)
+        self.pieces = copy_pieces(pieces)
+        for piece in self.pieces:
+            if piece['placed']:
+                self.board.place_piece(piece, *piece['grid_pos'])
+        self.solver = make_solver(
+            self.board, self.pieces, strategy, animate=False, prune=prune,
+            all_orientations=all_orientations, profile=profile, transposition_size=transposition_size, flips=flips
+        )
+        self.solver.cancel_event = threading.Event()
+        self.solver.on_progress = self._publish
+        self.progress = SolverProgress()
+        self._start = 0.0
+        self._thread = None
+
+    def start(self):
+        """
+        Start the worker thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="hexed-solver", daemon=True)
+        self._thread.start()
+
+    def cancel(self, timeout=1.0):
+        """
+        Ask the worker to stop and wait for it to finish.
+
+        Args:
+            timeout (float): Maximum time to wait for the thread, in seconds.
+        """
+        self.solver.cancel_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        self._start = time.thread_time()
+        solved = False
+        error = None
+        try:
+            solved = self.solver.solve()
+        except SolverCancelled:
+            pass
+        except Exception as e: # Handed to the GUI: an uncaught one would end the thread silently
+            error = e
+        finally:
+            # Always publish a final snapshot, or the GUI would wait for it forever
+            self._publish(self.solver, done=True, solved=solved, error=error)
+
+    def _publish(self, solver, done=False, solved=False, error=None):
+        """
+        Build a snapshot from the solver state and make it visible to readers.
+        """
+        placements = []
+        for i, k, anchor in solver.solution:
+            shape, parity = solver.orientations[i][k]
+            placements.append((self.pieces[i]['id'], shape, parity, anchor))
+        self.progress = SolverProgress(
+            placements=tuple(placements),
+            nodes=solver.stats.nodes,
+            backtracks=solver.stats.backtracks,
+            elapsed=time.thread_time() - self._start,
+            done=done,
+            solved=solved,
+            error=error,
+            version=self.progress.version + 1,
+        )
@@ -0,0 +1,416 @@
+"""
+Reproducible performance benchmarks for the generator, the solvers and the layout.
+
+Every sample plays a level ID derived from (base seed, side, run), so two runs
+of the harness on the same code measure exactly the same boards. The level IDs
+are stored with the results: a slow board can be opened in the game with
+`python hexed_gui.py --level ID`.
+
+Each sample runs in a fresh process: caches start cold, a hung generator can be
+killed after `--sample-timeout` seconds, and measurements do not leak between
+samples.
+
+Usage:
+    python bench.py                          # sides 3..8, 5 runs each
+    python bench.py --sides 3 4 --repeat 10 --output before.json
+    python bench.py --output after.json --compare before.json
+
+Results are written as JSON (see run_benchmarks). With --compare, the medians
+are checked against a previous results file and slowdowns are reported.
+
+The layout benchmark needs pygame (it drives HexGame's layout code with the
+SDL dummy video driver); it is skipped when pygame is not installed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+from solver import (
+    GenerationStats, HexBoard, LEVEL_SEED_BITS, SOLVER_STRATEGIES, SolverCancelled, copy_pieces, generate_level, make_level_id,
+    make_solver
+)
+
+RESULTS_VERSION = 1
+LAYOUT_SCREEN = (1920, 1080) # Screen size used by the layout benchmark
+LAYOUT_ITERATIONS = 50 # Layout calls per sample (one call is too fast to time alone)
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (list): Numbers (need not be sorted).
+        q (float): Percentile in [0, 100].
+
+    Returns:
+        float: The percentile, or None if values is empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def sample_level_id(seed, side, run):
+    """
+    Level ID of one sample. String seeds are hashed with SHA-512 by `random`, so
+    the IDs are stable across processes and Python runs.
+    """
+    return make_level_id(side, random.Random(f"{seed}:{side}:{run}").getrandbits(LEVEL_SEED_BITS))
+
+
+def _traced_peak(func):
+    """
+    Run func under tracemalloc.
+
+    Returns:
+        int: Peak traced memory, in bytes.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _solve_once(side, pieces, strategy, prune, timeout):
+    """
+    Solve a fresh board with a time limit.
+
+    Returns:
+        tuple: (solved, timed out, nodes explored)
+    """
+    board = HexBoard(side)
+    solver = make_solver(board, copy_pieces(pieces), strategy, animate=False, prune=prune)
+    solver.cancel_event = threading.Event()
+    timer = threading.Timer(timeout, solver.cancel_event.set)
+    timer.start()
+    try:
+        return solver.solve(), False, solver.stats.nodes
+    except SolverCancelled:
+        return False, True, solver.stats.nodes
+    finally:
+        timer.cancel()
+
+
+def _layout_game(level_id):
+    """
+    Build a HexGame playing a level, in a LAYOUT_SCREEN window of the SDL dummy
+    video driver.
+
+    Returns:
+        HexGame: The game, or None if pygame is not available.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    try:
+        from hexed_gui import HexGame
+    except ImportError:
+        return None
+    return HexGame(level_id, size=LAYOUT_SCREEN)
+
+
+def _run_sample(level_id, strategies, prune, solve_timeout, memory):
+    """
+    Measure one board: generation, layout and every solver strategy.
+
+    Returns:
+        dict: Benchmark name -> measurement dict ('level', 'time', and optionally
+            'nodes', 'solved', 'timeout', 'peak_bytes', generator 'attempts',
+            'retries' and 'fragments'). Skipped benchmarks are absent.
+    """
+    results = {}
+
+    def generate(stats=None):
+        return generate_level(level_id, stats=stats)
+
+    generation = GenerationStats()
+    t0 = time.perf_counter()
+    board, pieces = generate(generation)
+    side = board.side
+    results['generate'] = {
+        'time': time.perf_counter() - t0, 'pieces': len(pieces),
+        'attempts': generation.attempts, 'retries': generation.retries, 'fragments': generation.fragments,
+    }
+    if memory:
+        results['generate']['peak_bytes'] = _traced_peak(generate)
+
+    game = _layout_game(level_id)
+    if game is not None:
+        def layout():
+            with contextlib.redirect_stdout(io.StringIO()): # Silence "could not fit" warnings
+                for _ in range(LAYOUT_ITERATIONS):
+                    game.fit_graphics_and_layout()
+
+        t0 = time.perf_counter()
+        layout()
+        results['layout'] = {'time': (time.perf_counter() - t0) / LAYOUT_ITERATIONS}
+        if memory:
+            results['layout']['peak_bytes'] = _traced_peak(layout)
+
+    for strategy in strategies:
+        t0 = time.perf_counter()
+        solved, timed_out, nodes = _solve_once(side, pieces, strategy, prune, solve_timeout)
+        entry = {'time': time.perf_counter() - t0, 'nodes': nodes, 'solved': solved, 'timeout': timed_out}
+        if memory and not timed_out:
+            entry['peak_bytes'] = _traced_peak(lambda: _solve_once(side, pieces, strategy, prune, solve_timeout))
+        results[f"solve:{strategy}{'+prune' if prune else ''}"] = entry
+
+    for entry in results.values():
+        entry['level'] = level_id
+    return results
+
+
+def _sample_worker(conn, *args):
+    try:
+        conn.send(_run_sample(*args))
+    finally:
+        conn.close()
+
+
+def _run_isolated(args, timeout):
+    """
+    Run _run_sample in a child process.
+
+    Returns:
+        tuple: (results, failure) where results is the sample results dict, or
+            None if the child did not finish in time or crashed, and failure
+            describes why ("timeout" or "exit code N"), or is None.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_sample_worker, args=(sender,) + args, daemon=True)
+    process.start()
+    sender.close()
+    result, failure = None, None
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+        except EOFError: # poll() is also True at EOF: the child died without sending
+            pass
+    else:
+        failure = "timeout"
+    process.join(1.0)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    if result is None and failure is None:
+        failure = f"exit code {process.exitcode}"
+    return result, failure
+
+
+def summarize(samples):
+    """
+    Aggregate the measurements of one benchmark.
+
+    Timed-out runs are counted but excluded from the latency statistics.
+
+    Args:
+        samples (list): Measurement dicts returned by _run_sample.
+
+    Returns:
+        dict: 'runs', 'timeouts', 'median', 'p95', 'min', 'max' (seconds),
+            'nodes_median', 'nodes_p95', 'peak_kib', 'retry_rate' (generator only),
+            the raw 'times' and the 'levels' of the samples (same order as the samples).
+    """
+    done = [s for s in samples if not s.get('timeout')]
+    times = [s['time'] for s in done]
+    nodes = [s['nodes'] for s in done if 'nodes' in s]
+    peaks = [s['peak_bytes'] for s in samples if 'peak_bytes' in s]
+    attempts = sum(s.get('attempts', 0) for s in samples)
+    return {
+        'runs': len(samples),
+        'timeouts': len(samples) - len(done),
+        'median': statistics.median(times) if times else None,
+        'p95': percentile(times, 95),
+        'min': min(times) if times else None,
+        'max': max(times) if times else None,
+        'nodes_median': statistics.median(nodes) if nodes else None,
+        'nodes_p95': percentile(nodes, 95),
+        'peak_kib': max(peaks) / 1024 if peaks else None,
+        'retry_rate': sum(s.get('retries', 0) for s in samples) / attempts if attempts else None,
+        'times': times,
+        'levels': [s['level'] for s in samples],
+    }
+
+
+def run_benchmarks(sides, repeat=5, seed=0, strategies=None, prune=True, solve_timeout=30.0,
+                   sample_timeout=120.0, memory=True, log=None):
+    """
+    Run the benchmark suite.
+
+    Args:
+        sides (list): Board sides to measure.
+        repeat (int): Number of boards (seeds) per side.
+        seed (int): Base seed.
+        strategies (list, optional): Solver strategies. Defaults to all of SOLVER_STRATEGIES.
+        prune (bool): Enable dead-region pruning in the solvers.
+        solve_timeout (float): Time limit of one solve, in seconds (counted as a timeout).
+        sample_timeout (float): Time limit of one whole sample (generation included).
+            Once a side hits it, its remaining runs are skipped. A sample whose process
+            crashes is handled the same way, and its level is listed in 'failed'.
+        memory (bool): Also measure peak traced memory (one extra traced run per benchmark).
+        log (callable, optional): Called with progress messages.
+
+    Returns:
+        dict: {'meta': {...}, 'results': [{'side', 'bench', 'skipped', 'failed', ...summary}]}
+    """
+    strategies = sorted(SOLVER_STRATEGIES) if strategies is None else list(strategies)
+    log = log or (lambda message: None)
+    results = []
+    for side in sides:
+        by_bench = {}
+        skipped = 0
+        failed = [] # Levels whose sample process crashed
+        for run in range(repeat):
+            level_id = sample_level_id(seed, side, run)
+            args = (level_id, strategies, prune, solve_timeout, memory)
+            sample, failure = _run_isolated(args, sample_timeout)
+            if sample is None:
+                skipped = repeat - run
+                if failure == "timeout":
+                    log(f"side {side}: level {level_id} exceeded {sample_timeout:.0f}s, skipping {skipped} run(s)")
+                else:
+                    failed.append(level_id)
+                    log(f"side {side}: level {level_id} failed ({failure}), skipping {skipped} run(s)")
+                break
+            for bench, measurement in sample.items():
+                by_bench.setdefault(bench, []).append(measurement)
+            log(f"side {side}: run {run + 1}/{repeat} done")
+        for bench, samples in by_bench.items():
+            summary = summarize(samples)
+            summary['skipped'] = skipped
+            summary['failed'] = failed
+            results.append(dict(side=side, bench=bench, **summary))
+        if not by_bench:
+            results.append(dict(side=side, bench='generate', **summarize([]), skipped=skipped, failed=failed))
+
+    return {
+        'meta': {
+            'version': RESULTS_VERSION,
+            'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'sides': list(sides),
+            'repeat': repeat,
+            'seed': seed,
+            'strategies': strategies,
+            'prune': prune,
+            'solve_timeout': solve_timeout,
+            'sample_timeout': sample_timeout,
+        },
+        'results': results,
+    }
+
+
+def compare_results(old, new, threshold=0.10):
+    """
+    Compare the median latencies of two result sets.
+
+    Args:
+        old (dict): Baseline results (as returned by run_benchmarks).
+        new (dict): New results.
+        threshold (float): Relative slowdown above which a benchmark is flagged.
+
+    Returns:
+        list: (side, bench, old median, new median, ratio, regressed) for every
+            benchmark present in both sets with a median in both.
+    """
+    baseline = {(r['side'], r['bench']): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        before = baseline.get((r['side'], r['bench']))
+        if before is None or before['median'] is None or r['median'] is None or before['median'] <= 0:
+            continue
+        ratio = r['median'] / before['median']
+        rows.append((r['side'], r['bench'], before['median'], r['median'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _fmt_seconds(value):
+    if value is None:
+        return "-"
+    if value < 1e-3:
+        return f"{value * 1e6:.0f}us"
+    if value < 1:
+        return f"{value * 1e3:.1f}ms"
+    return f"{value:.2f}s"
+
+
+def format_table(data):
+    """
+    Render results as a plain-text table.
+    """
+    lines = [f"{'side':>4}  {'benchmark':<20} {'median':>9} {'p95':>9} {'nodes':>10} {'peak KiB':>9}  notes"]
+    for r in data['results']:
+        nodes = "-" if r['nodes_median'] is None else f"{r['nodes_median']:,.0f}"
+        peak = "-" if r['peak_kib'] is None else f"{r['peak_kib']:,.0f}"
+        notes = []
+        if r.get('retry_rate'):
+            notes.append(f"retry rate {r['retry_rate']:.0%}")
+        if r['timeouts']:
+            notes.append(f"{r['timeouts']} timeout(s)")
+        if r.get('failed'):
+            notes.append(f"{len(r['failed'])} sample(s) failed")
+        if r.get('skipped'):
+            notes.append(f"{r['skipped']} run(s) skipped")
+        lines.append(f"{r['side']:>4}  {r['bench']:<20} {_fmt_seconds(r['median']):>9} {_fmt_seconds(r['p95']):>9}"
+                     f" {nodes:>10} {peak:>9}  {', '.join(notes)}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HEXED generator, solvers and layout.")
+    parser.add_argument("--sides", type=int, nargs="+", default=list(range(3, 9)), help="board sides (default: 3-8)")
+    parser.add_argument("--repeat", type=int, default=5, help="boards per side (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed (default: 0)")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(SOLVER_STRATEGIES), help="solver strategies (default: all)")
+    parser.add_argument("--no-prune", action="store_true", help="disable dead-region pruning")
+    parser.add_argument("--solve-timeout", type=float, default=30.0, help="seconds per solve (default: 30)")
+    parser.add_argument("--sample-timeout", type=float, default=120.0, help="seconds per board, generation included (default: 120)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file (default: bench_results.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="previous results file to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown flagged by --compare (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    data = run_benchmarks(
+        args.sides, repeat=args.repeat, seed=args.seed, strategies=args.strategies, prune=not args.no_prune,
+        solve_timeout=args.solve_timeout, sample_timeout=args.sample_timeout, memory=not args.no_memory,
+        log=lambda message: print(message, file=sys.stderr, flush=True),
+    )
+    with open(args.output, "w") as f:
+        json.dump(data, f, indent=2)
+    print(format_table(data))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, data, args.threshold)
+        regressions = 0
+        print(f"\nComparison with {args.compare}:")
+        for side, bench, before, after, ratio, regressed in rows:
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{side:>4}  {bench:<20} {_fmt_seconds(before):>9} -> {_fmt_seconds(after):>9}  x{ratio:.2f}{flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
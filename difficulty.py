@@ -0,0 +1,297 @@
+"""
+Difficulty-targeted level generation.
+
+Candidate levels are generated from random level IDs and scored with the
+headless solver (see score_level). Only the first candidate whose difficulty
+falls inside the requested band is kept. Candidates are scored by a pool of
+worker processes, in candidate order, so a given seed always selects the same
+level whatever the number of processes.
+
+Usage:
+    python difficulty.py --side 4 --band hard --count 3
+"""
+import argparse
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+from solver import LEVEL_SEED_BITS, GenerationError, SolverCancelled, generate_level, make_level_id, make_solver
+
+# Difficulty bands: name -> (min difficulty, max difficulty or None)
+DIFFICULTY_BANDS = {
+    'easy': (0.0, 0.4),
+    'medium': (0.4, 0.8),
+    'hard': (0.8, None),
+}
+SCORE_STRATEGY = 'backtrack' # Strategy used to score levels (first-empty-cell search, close to how players fill a board)
+SCORE_SOLUTION_LIMIT = 10 # Solutions are counted up to this number
+SCORE_NODE_LIMIT = 200000 # Scoring gives up after this many nodes
+
+
+class LevelScore:
+    """
+    Solver-based evaluation of a level.
+
+    Attributes:
+        level_id (str): The scored level.
+        pieces (int): Number of pieces.
+        solutions (int): Number of distinct solutions found (up to the board
+            symmetries, capped by the solution limit).
+        exhausted (bool): Whether the whole search tree was explored (solutions is exact).
+        nodes (int): Nodes explored by the solver before its first solution.
+        forced_ratio (float): Fraction of the search decisions that had a single option.
+        elapsed (float): Scoring time, in seconds.
+        completed (bool): False if the node limit was hit before the first solution.
+    """
+    def __init__(self, level_id, pieces=0, solutions=0, exhausted=False, nodes=0, forced_ratio=0.0,
+                 elapsed=0.0, completed=True):
+        self.level_id = level_id
+        self.pieces = pieces
+        self.solutions = solutions
+        self.exhausted = exhausted
+        self.nodes = nodes
+        self.forced_ratio = forced_ratio
+        self.elapsed = elapsed
+        self.completed = completed
+
+    @property
+    def difficulty(self):
+        """
+        Difficulty score: search effort per piece (log scale), discounted by the
+        moves that are forced and by the number of solutions.
+
+            log10(1 + nodes / pieces) * (1 - forced_ratio) / (1 + log10(solutions))
+
+        Returns:
+            float: The score (higher is harder), or None if scoring did not complete.
+        """
+        if not self.completed or not self.solutions:
+            return None
+        effort = math.log10(1 + self.nodes / max(1, self.pieces))
+        return effort * (1 - self.forced_ratio) / (1 + math.log10(self.solutions))
+
+    def band(self):
+        """
+        Get the name of the difficulty band of the level.
+
+        Returns:
+            str: A key of DIFFICULTY_BANDS, or None if the level could not be scored.
+        """
+        return band_of(self.difficulty)
+
+    def to_dict(self):
+        """
+        Get the score as plain data.
+
+        Returns:
+            dict: JSON-serializable score.
+        """
+        return {
+            'level_id': self.level_id,
+            'pieces': self.pieces,
+            'solutions': self.solutions,
+            'exhausted': self.exhausted,
+            'nodes': self.nodes,
+            'forced_ratio': self.forced_ratio,
+            'elapsed': self.elapsed,
+            'completed': self.completed,
+            'difficulty': self.difficulty,
+        }
+
+
+def score_level(level_id, strategy=SCORE_STRATEGY, solution_limit=SCORE_SOLUTION_LIMIT,
+                node_limit=SCORE_NODE_LIMIT):
+    """
+    Score a level with the headless solver.
+
+    Args:
+        level_id (str): The level to score.
+        strategy (str): Solver strategy (a key of SOLVER_STRATEGIES).
+        solution_limit (int): Stop counting solutions at this number.
+        node_limit (int): Give up after this many nodes (checked every 1024 nodes).
+
+    Returns:
+        LevelScore: The score.
+    """
+    start = time.perf_counter()
+    try:
+        board, pieces = generate_level(level_id)
+    except GenerationError: # Unique candidate the generator gave up on: never in a band
+        return LevelScore(level_id, elapsed=time.perf_counter() - start, completed=False)
+    # No transposition table: skipping dead subtrees would lower the node counts
+    # and shift every score away from the calibrated bands
+    solver = make_solver(board, pieces, strategy, animate=False, prune=True, transposition_size=0)
+
+    def check_budget(solver):
+        if solver.stats.nodes >= node_limit:
+            raise SolverCancelled()
+
+    solver.on_progress = check_budget
+    try:
+        solver.count_solutions(solution_limit, symmetry=True)
+    except SolverCancelled:
+        pass
+    stats = solver.stats
+    return LevelScore(
+        level_id,
+        pieces=len(pieces),
+        solutions=stats.solutions,
+        exhausted=stats.exhausted,
+        nodes=stats.nodes_to_first,
+        forced_ratio=stats.forced_ratio,
+        elapsed=time.perf_counter() - start,
+        completed=stats.solutions > 0,
+    )
+
+
+def band_of(difficulty):
+    """
+    Get the name of the band containing a difficulty value.
+
+    Args:
+        difficulty (float): A difficulty (see LevelScore.difficulty), or None.
+
+    Returns:
+        str: A key of DIFFICULTY_BANDS, or None if difficulty is None.
+    """
+    if difficulty is None:
+        return None
+    for name, (low, high) in DIFFICULTY_BANDS.items():
+        if difficulty >= low and (high is None or difficulty < high):
+            return name
+    return None
+
+
+def in_band(score, band):
+    """
+    Check whether a level falls inside a difficulty band.
+
+    Args:
+        score (LevelScore): The level score.
+        band (str): A key of DIFFICULTY_BANDS, or None to accept any scored level.
+
+    Returns:
+        bool: True if the difficulty is inside the band.
+    """
+    if band is None:
+        return score.difficulty is not None
+    return band_of(score.difficulty) == band
+
+
+def candidate_level_ids(side, seed=None, unique=False):
+    """
+    Generate an endless sequence of candidate level IDs.
+
+    Args:
+        side (int): Side of the board.
+        seed (int, optional): Seed of the sequence. Random if None.
+        unique (bool): Generate IDs of unique-solution levels.
+
+    Yields:
+        str: Level IDs.
+    """
+    rng = random.Random(seed)
+    while True:
+        yield make_level_id(side, rng.getrandbits(LEVEL_SEED_BITS), unique)
+
+
+def generate_for_difficulty(side, band, seed=None, max_candidates=200, processes=None, unique=False,
+                            mp_context=None, cancel_event=None, **score_options):
+    """
+    Find a level of the requested difficulty.
+
+    Args:
+        side (int): Side of the board.
+        band (str): A key of DIFFICULTY_BANDS.
+        seed (int, optional): Seed of the candidate sequence. Random if None.
+        max_candidates (int): Number of candidates scored before giving up.
+        processes (int, optional): Pool size. Defaults to the number of CPUs.
+        unique (bool): Only consider levels with a single solution.
+        mp_context (optional): See generate_levels_for_difficulty.
+        cancel_event (threading.Event, optional): See generate_levels_for_difficulty.
+        **score_options: Passed to score_level.
+
+    Returns:
+        LevelScore: The score of the first candidate in the band, or None if no
+            candidate matched.
+    """
+    for score in generate_levels_for_difficulty(side, band, 1, seed, max_candidates, processes, unique,
+                                                mp_context, cancel_event, **score_options):
+        return score
+    return None
+
+
+def generate_levels_for_difficulty(side, band, count, seed=None, max_candidates=200, processes=None,
+                                   unique=False, mp_context=None, cancel_event=None, **score_options):
+    """
+    Find several levels of the requested difficulty.
+
+    Args:
+        side (int): Side of the board.
+        band (str): A key of DIFFICULTY_BANDS, or None to accept any scored level.
+        count (int): Number of levels wanted.
+        seed (int, optional): Seed of the candidate sequence. Random if None.
+        max_candidates (int): Number of candidates scored before giving up.
+        processes (int, optional): Pool size. Defaults to the number of CPUs.
+        unique (bool): Only consider levels with a single solution.
+        mp_context (optional): multiprocessing context the pool is created from. Pass
+            multiprocessing.get_context('spawn') from a process that runs threads or
+            holds a display: forking it would copy that state into the workers.
+            Defaults to the multiprocessing module itself.
+        cancel_event (threading.Event, optional): When set, the search stops with
+            SolverCancelled (checked as every score comes back).
+        **score_options: Passed to score_level.
+
+    Yields:
+        LevelScore: Scores of the matching levels, in candidate order (at most `count`).
+    """
+    if band is not None and band not in DIFFICULTY_BANDS:
+        raise ValueError(f"Unknown difficulty band: {band!r}")
+    candidates = candidate_level_ids(side, seed, unique)
+    tasks = ((next(candidates), score_options) for _ in range(max_candidates))
+    found = 0
+    with (mp_context or multiprocessing).Pool(processes) as pool:
+        # imap keeps candidate order, so the result does not depend on the pool size
+        for score in pool.imap(_score_task, tasks):
+            if cancel_event is not None and cancel_event.is_set():
+                raise SolverCancelled()
+            if in_band(score, band):
+                yield score
+                found += 1
+                if found == count:
+                    return
+
+
+def _score_task(task):
+    level_id, score_options = task
+    return score_level(level_id, **score_options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate HEXED levels of a given difficulty.")
+    parser.add_argument("--side", type=int, default=3, help="board side (default: 3)")
+    parser.add_argument("--band", choices=list(DIFFICULTY_BANDS), default="medium", help="difficulty band")
+    parser.add_argument("--count", type=int, default=1, help="number of levels (default: 1)")
+    parser.add_argument("--seed", type=int, help="seed of the candidate sequence (default: random)")
+    parser.add_argument("--max-candidates", type=int, default=200, help="candidates scored before giving up")
+    parser.add_argument("--processes", type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--unique", action="store_true", help="only levels with a single solution")
+    args = parser.parse_args(argv)
+
+    found = 0
+    for score in generate_levels_for_difficulty(args.side, args.band, args.count, args.seed,
+                                                args.max_candidates, args.processes, args.unique):
+        found += 1
+        print(f"{score.level_id}  difficulty {score.difficulty:.2f} | nodes {score.nodes:,}"
+              f" | solutions {score.solutions}{'' if score.exhausted else '+'}"
+              f" | forced {score.forced_ratio:.0%}")
+    if found < args.count:
+        print(f"Only {found} of {args.count} level(s) found in {args.max_candidates} candidates", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
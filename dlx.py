@@ -0,0 +1,166 @@
+"""
+Dancing Links (Knuth's Algorithm X) for generic exact cover problems.
+
+The matrix is stored in flat, index-based lists instead of node objects: every
+node is an integer and its left/right/up/down neighbors, column header and row
+id live in parallel lists. Node 0 is the root and nodes 1..num_columns are the
+column headers.
+
+This module has no dependencies and knows nothing about the puzzle; see
+solver.DLXSolver for the tiling-specific wrapper.
+"""
+
+
+class DancingLinks:
+    """
+    A sparse 0/1 matrix supporting the cover/uncover operations of Algorithm X.
+    """
+    def __init__(self, num_columns, rows):
+        """
+        Build the linked structure.
+
+        Args:
+            num_columns (int): Number of (primary) columns to cover.
+            rows (list): One list of column indices (0-based) per matrix row.
+        """
+        n = num_columns
+        # Headers: root (0) and columns (1..n) form a circular horizontal list
+        self.L = [i - 1 for i in range(n + 1)]
+        self.R = [i + 1 for i in range(n + 1)]
+        self.L[0] = n
+        self.R[n] = 0
+        self.U = list(range(n + 1))
+        self.D = list(range(n + 1))
+        self.C = list(range(n + 1))
+        self.row_id = [-1] * (n + 1)
+        self.S = [0] * (n + 1)  # Number of nodes in each column
+        self.num_rows = len(rows)
+
+        L, R, U, D, C = self.L, self.R, self.U, self.D, self.C
+        for row_index, columns in enumerate(rows):
+            first = None
+            for col in columns:
+                header = col + 1
+                node = len(C)
+                # Insert at the bottom of the column
+                U.append(U[header])
+                D.append(header)
+                D[U[header]] = node
+                U[header] = node
+                C.append(header)
+                self.row_id.append(row_index)
+                self.S[header] += 1
+                # Link into the row
+                if first is None:
+                    first = node
+                    L.append(node)
+                    R.append(node)
+                else:
+                    L.append(L[first])
+                    R.append(first)
+                    R[L[first]] = node
+                    L[first] = node
+
+    def cover(self, header):
+        """
+        Remove a column and every row intersecting it from the matrix.
+        """
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[header]] = R[header]
+        L[R[header]] = L[header]
+        i = D[header]
+        while i != header:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, header):
+        """
+        Undo cover(header). Must be called in reverse order of the covers.
+        """
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[header]
+        while i != header:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[header]] = header
+        L[R[header]] = header
+
+    def choose_column(self):
+        """
+        Pick the uncovered column with the fewest remaining rows
+        (minimum-remaining-values heuristic).
+
+        Returns:
+            int: The column header node, or 0 if every column is covered.
+        """
+        R, S = self.R, self.S
+        best = 0
+        best_size = None
+        c = R[0]
+        while c != 0:
+            size = S[c]
+            if best_size is None or size < best_size:
+                best, best_size = c, size
+                if size <= 1:
+                    break
+            c = R[c]
+        return best
+
+    def select(self, node):
+        """
+        Commit to the row containing `node`: cover every other column of that row.
+        The column of `node` itself must already be covered.
+        """
+        j = self.R[node]
+        while j != node:
+            self.cover(self.C[j])
+            j = self.R[j]
+
+    def deselect(self, node):
+        """
+        Undo select(node).
+        """
+        j = self.L[node]
+        while j != node:
+            self.uncover(self.C[j])
+            j = self.L[j]
+
+    def solutions(self):
+        """
+        Generate every exact cover.
+
+        Yields:
+            list: Row indices of a solution. The list is reused between yields,
+                copy it if it must be kept.
+        """
+        partial = []
+
+        def search():
+            header = self.choose_column()
+            if header == 0:
+                yield partial
+                return
+            if self.S[header] == 0:
+                return
+            self.cover(header)
+            node = self.D[header]
+            while node != header:
+                partial.append(self.row_id[node])
+                self.select(node)
+                yield from search()
+                self.deselect(node)
+                partial.pop()
+                node = self.D[node]
+            self.uncover(header)
+
+        yield from search()
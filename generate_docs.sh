@@ -4,6 +4,7 @@
 DOCS_DIR="docs"
 HEXED_DOC_FILE="$DOCS_DIR/hexed_gui.html"
 PARTICLE_DOC_FILE="$DOCS_DIR/particle.html"
+SOLVER_DOC_FILE="$DOCS_DIR/solver.html"
 
 # Create docs directory if it doesn't exist
 if [ ! -d "$DOCS_DIR" ]; then
@@ -39,4 +40,18 @@ else
     exit 1
 fi
 
+echo "Generating documentation for solver.py..."
+
+# Generate documentation for the headless solver module
+./venv/bin/python3 -m pydoc -w solver
+
+# Move the generated file to docs directory
+if [ -f "solver.html" ]; then
+    mv solver.html "$SOLVER_DOC_FILE"
+    echo "Documentation generated successfully: $SOLVER_DOC_FILE"
+else
+    echo "Error: Failed to generate documentation for solver.py"
+    exit 1
+fi
+
 echo "All documentation generated successfully in $DOCS_DIR/ directory!"
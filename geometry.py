@@ -0,0 +1,219 @@
+"""
+Screen geometry of a board at a given scale.
+
+Rendering and hit-testing need the pixel vertices and centroids of every cell.
+They only depend on the board and on the metrics computed by
+HexGame.calc_metrics, so they are computed once per scale into tables indexed
+like HexBoard.cells (bit order), instead of once per cell on every frame.
+
+NumPy is used when it is installed: the tables are then arrays built in a few
+vectorized operations. Without NumPy the same tables are flat `array` buffers
+filled by plain loops.
+
+Hit-testing does not use the tables to scan cells: the triangular lattice is
+inverted analytically (row from y, column from x, then a test against the
+slanted edge), so it costs the same on every board size.
+"""
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError: # Optional dependency
+    numpy = None
+
+
+class GridGeometry:
+    """
+    Pixel geometry of every cell of a board, for one scale and offset.
+
+    Attributes:
+        board (HexBoard): The board the tables describe.
+        tri_w (float): Width of a triangle, in pixels.
+        tri_h (float): Height of a triangle, in pixels.
+        offset_x (float): Screen x of column 0.
+        offset_y (float): Screen y of row 0.
+        vertices: Bit index -> 3 (x, y) vertices. A (cells, 3, 2) NumPy array, or a
+            flat array('d') of 6 floats per cell without NumPy.
+        centroids: Bit index -> (x, y) centroid. A (cells, 2) NumPy array, or a
+            flat array('d') of 2 floats per cell without NumPy.
+        parities (array): Bit index -> (row + col) % 2 (0: the triangle points UP).
+        points (list): Bit index -> list of 3 (x, y) tuples, ready for pygame.draw.polygon.
+        centers (list): Bit index -> (x, y) centroid tuple, for fast scalar lookups.
+        neighbors (tuple): Bit index -> tuple of adjacent bit indices (see HexBoard.neighbor_indices).
+        triangle_offsets (tuple): Parity -> 3 (dx, dy) vertex offsets from the top-left
+            corner of a cell, used to draw pieces anywhere on screen.
+    """
+    def __init__(self, board, tri_w, tri_h, offset_x, offset_y):
+        """
+        Compute the tables.
+
+        Args:
+            board (HexBoard): The board.
+            tri_w (float): Width of a triangle, in pixels.
+            tri_h (float): Height of a triangle, in pixels.
+            offset_x (float): Screen x of column 0.
+            offset_y (float): Screen y of row 0.
+        """
+        self.board = board
+        self.tri_w = tri_w
+        self.tri_h = tri_h
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.neighbors = board.neighbor_indices
+
+        half_w = tri_w / 2
+        # Vertices relative to the top-left corner of the cell box:
+        # UP is (top, bottom left, bottom right), DOWN is (top left, top right, bottom)
+        self.triangle_offsets = (
+            ((half_w, 0.0), (0.0, tri_h), (tri_w, tri_h)),
+            ((0.0, 0.0), (tri_w, 0.0), (half_w, tri_h)),
+        )
+        self.parities = array('b', ((r + c) % 2 for r, c in board.cells))
+
+        if numpy is not None:
+            self._build_numpy()
+        else:
+            self._build_arrays()
+
+    def _build_numpy(self):
+        cells = numpy.array(self.board.cells, dtype=float).reshape(-1, 2)
+        corners = numpy.column_stack((
+            self.offset_x + cells[:, 1] * (self.tri_w / 2),
+            self.offset_y + cells[:, 0] * self.tri_h,
+        ))
+        offsets = numpy.array(self.triangle_offsets)  # (parity, vertex, xy)
+        parities = numpy.frombuffer(self.parities, dtype=numpy.int8)
+        self.vertices = corners[:, None, :] + offsets[parities]
+        self.centroids = self.vertices.mean(axis=1)
+        self.points = [[tuple(p) for p in triangle] for triangle in self.vertices.tolist()]
+        self.centers = [tuple(p) for p in self.centroids.tolist()]
+
+    def _build_arrays(self):
+        vertices = array('d')
+        centroids = array('d')
+        self.points = []
+        self.centers = []
+        half_w = self.tri_w / 2
+        for (r, c), parity in zip(self.board.cells, self.parities):
+            x, y = self.offset_x + c * half_w, self.offset_y + r * self.tri_h
+            triangle = [(x + dx, y + dy) for dx, dy in self.triangle_offsets[parity]]
+            for px, py in triangle:
+                vertices.append(px)
+                vertices.append(py)
+            center = (sum(p[0] for p in triangle) / 3, sum(p[1] for p in triangle) / 3)
+            centroids.extend(center)
+            self.points.append(triangle)
+            self.centers.append(center)
+        self.vertices = vertices
+        self.centroids = centroids
+
+    def cell_points(self, r, c):
+        """
+        Get the screen vertices of a cell.
+
+        Args:
+            r (int): Row index.
+            c (int): Column index.
+
+        Returns:
+            list: 3 (x, y) tuples.
+        """
+        return self.points[self.board.cell_index[(r, c)]]
+
+    def cell_centroid(self, r, c):
+        """
+        Get the screen centroid of a cell.
+
+        Args:
+            r (int): Row index.
+            c (int): Column index.
+
+        Returns:
+            tuple: (x, y)
+        """
+        return self.centers[self.board.cell_index[(r, c)]]
+
+    def lattice_cell(self, x, y):
+        """
+        Invert the triangular lattice: find the (row, col) triangle containing a
+        screen point, whether or not it is on the board.
+
+        The row comes straight from y. In half-triangle-width units the cell box
+        of column c spans [c, c + 2], so x falls in the overlap of the boxes of
+        columns floor(x) - 1 and floor(x); the slanted edge they share tells
+        which of the two triangles holds the point.
+
+        Args:
+            x (float): Screen x coordinate.
+            y (float): Screen y coordinate.
+
+        Returns:
+            tuple: (row, col)
+        """
+        v = (y - self.offset_y) / self.tri_h
+        u = (x - self.offset_x) / (self.tri_w / 2)
+        row = math.floor(v)
+        col = math.floor(u)
+        fy = v - row # 0 at the top of the row, 1 at the bottom
+        fx = u - col # 0 at the left of the strip, 1 at the right
+        if (row + col) % 2 == 0:
+            # Column col points UP: its left edge rises from bottom-left to top-right
+            inside = fx + fy >= 1
+        else:
+            # Column col points DOWN: its left edge falls from top-left to bottom-right
+            inside = fx >= fy
+        return (row, col) if inside else (row, col - 1)
+
+    def cell_at(self, x, y):
+        """
+        Get the board cell containing a screen point.
+
+        Args:
+            x (float): Screen x coordinate.
+            y (float): Screen y coordinate.
+
+        Returns:
+            tuple: The (row, col) cell, or None if the point is off the board.
+        """
+        cell = self.lattice_cell(x, y)
+        return cell if cell in self.board.cell_index else None
+
+    def nearest_cell(self, x, y, parity=None):
+        """
+        Find the board cell whose centroid is closest to a screen point, within
+        one triangle width.
+
+        The triangle containing the point is the answer whenever it qualifies (on
+        equilateral triangles it is the closest centroid). Otherwise only the
+        cells of the 3 x 5 window around it can be within one triangle width:
+        rows further away are more than 4/3 triangle heights off, columns more
+        than one width.
+
+        Args:
+            x (float): Screen x coordinate.
+            y (float): Screen y coordinate.
+            parity (int, optional): If set, only cells with (r+c)%2 == parity are considered.
+
+        Returns:
+            tuple: The (row, col) cell, or None if no cell qualifies.
+        """
+        row, col = self.lattice_cell(x, y)
+        cell_index = self.board.cell_index
+        if (row, col) in cell_index and (parity is None or (row + col) % 2 == parity):
+            return (row, col)
+
+        best, best_dist = None, self.tri_w
+        centers = self.centers
+        for r in range(row - 1, row + 2):
+            for c in range(col - 2, col + 3):
+                if parity is not None and (r + c) % 2 != parity:
+                    continue
+                i = cell_index.get((r, c))
+                if i is None:
+                    continue
+                cx, cy = centers[i]
+                dist = math.hypot(x - cx, y - cy)
+                if dist < best_dist:
+                    best, best_dist = (r, c), dist
+        return best
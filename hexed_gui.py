@@ -1,13 +1,36 @@
 import pygame
+import argparse
 import random
 import time
 import sys
 import math
-from particle import Particle
+from particle import ParticleSystem
+from textcache import TextCache
+from background_generator import BackgroundGenerator
+from background_solver import BackgroundSolver
+from geometry import GridGeometry
+from packing import largest_fitting_scale, skyline_pack
+from spatialindex import SpatialGrid
+from difficulty import DIFFICULTY_BANDS, band_of
+from levelpack import LevelPack
+from solver import HexBoard, PIECE_COLORS_RGB, generate_level, make_level_id, make_solver, parse_level_id
 
 # --- CONFIGURATION ---
 HEX_SIDE = 3
+LEVEL_DIFFICULTY = None # None: any level | "easy" / "medium" / "hard": only levels of that band (see difficulty.py)
+LEVEL_UNIQUE = False # Only generate levels with a single solution (up to the symmetries of the board)
+LEVEL_PACK = None # If set (e.g. "hard4.hxp"), draw levels from this pre-generated pack instead (see levelpack.py)
 TARGET_DELAY = 50 # ms between steps (controls visual speed)
+SOLVE_MODE = "background" # "step": one step per TARGET_DELAY | "batch": steps within SOLVE_FRAME_BUDGET | "instant": solve off-screen, then replay | "background": worker thread
+SOLVE_FRAME_BUDGET = 10 # ms of solver work per frame in "batch" mode
+SOLVER_STRATEGY = "backtrack" # "backtrack" (first empty cell) or "dlx" (Dancing Links exact cover)
+SOLVER_PRUNE = True # Abandon branches that leave unfillable empty regions
+SOLVER_ALL_ORIENTATIONS = False # Let the solver also rotate pieces, which the player cannot do
+SOLVER_FLIPS = True # Let the solver flip pieces like the arrow keys do (needed if the player flipped some)
+SOLVER_PROFILE = False # Also record time per depth level and per-piece placement attempts
+SOLVER_TRANSPOSITION_SIZE = 1 << 16 # Dead search states remembered by the solver (0: no transposition table)
+SHOW_SOLVER_STATS = True # Overlay node/backtrack counters under the status text
+SOLVER_STATS_FILE = None # If set (e.g. "solver_stats.json"), dump the solver statistics there after each solve
 
 # Colors (RGB)
 BG_COLOR = (15, 15, 20) # Dark, modern
@@ -20,57 +43,106 @@ INVENTORY_BG_COLOR = (20, 20, 25)
 
 # UI Config
 INVENTORY_RATIO = 0.4 # 40% of screen width for pieces inventory
+INVENTORY_PADDING = 10 # Pixels between inventory pieces
+MIN_SCALE = 0.3 # Smallest scale tried when the inventory does not fit
+PARTICLES_PER_LETTER = 30 # Particles of the completion explosion, per letter of "Completed!"
+PULSE_STEPS = 9 # Pre-rendered scale steps of the "Completed!" pulse (one smoothscale per letter and step)
 
-PIECE_COLORS_RGB = [
-    (255, 107, 107), (78, 205, 196), (255, 230, 109), (26, 83, 92), 
-    (247, 255, 247), (255, 50, 50), (100, 100, 255), (100, 255, 100),
-    (255, 100, 255), (100, 255, 255), (255, 150, 50), (150, 50, 255),
-    (50, 250, 150), (250, 50, 150), (50, 150, 250), (200, 200, 200)
-]
 
 class HexGame:
     """
     A class to represent and solve a Hexagon tiling puzzle manually or 
     automatically using a backtracking algorithm with visual representation.
     """
-    def __init__(self):
+    def __init__(self, level_id=None, difficulty=LEVEL_DIFFICULTY, unique=LEVEL_UNIQUE, pack=LEVEL_PACK, size=None):
         """
         Initialize the HexGame, setting up the Pygame window, grid, pieces, and solver.
+
+        Args:
+            level_id (str, optional): Level to play (see solver.make_level_id). It also
+                sets the board side. A random level of side HEX_SIDE is generated if None.
+            difficulty (str, optional): Difficulty band of the generated levels
+                (a key of DIFFICULTY_BANDS), or None for any level.
+            unique (bool): Only generate levels with a single solution.
+            pack (str, optional): Level pack file. When set, random levels are read
+                from the pack (which also sets the board side) instead of generated.
+            size (tuple, optional): (width, height) of a window to open instead of
+                going fullscreen (e.g. with the SDL dummy video driver, see bench.py).
         """
         pygame.init()
         
-        # Setup Fullscreen
-        info = pygame.display.Info()
-        self.width = info.current_w
-        self.height = info.current_h
-        self.screen = pygame.display.set_mode((self.width, self.height), pygame.FULLSCREEN | pygame.HWSURFACE | pygame.DOUBLEBUF)
+        if size is None:
+            # Setup Fullscreen
+            info = pygame.display.Info()
+            self.width = info.current_w
+            self.height = info.current_h
+            self.screen = pygame.display.set_mode((self.width, self.height), pygame.FULLSCREEN | pygame.HWSURFACE | pygame.DOUBLEBUF)
+        else:
+            self.width, self.height = size
+            self.screen = pygame.display.set_mode(size)
         pygame.display.set_caption("HEXED: One Piece Left")
         
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont("Arial", 24)
+        self.text_cache = TextCache() # Rendered HUD strings, so idle frames do not rasterize text
         
         # Solver Logic
-        self.side = HEX_SIDE
-        self.grid = {}
+        self.pack = LevelPack(pack) if pack else None
+        self.side = parse_level_id(level_id)[0] if level_id else self.pack.side if self.pack else HEX_SIDE
+        self.level_id = None # ID of the current level, regenerates the same pieces
+        self.difficulty = difficulty
+        self.unique = unique
+        self.level_difficulty = None # Difficulty score of the current level, when known
+        self.generator = None # Worker thread generating the current level, while it is not ready
+        self.board = None
         self.pieces = []
         self.dragging_piece = None
         self.hovered_piece = None
         self.drag_offset = (0, 0)
         self.solving = False # Flag to indicate if solver is running
+        self.inventory_slots = None # Piece index -> (x, y) top-left of its inventory slot (see layout_inventory)
+        self.inventory_slot_sizes = [] # Piece index -> (width, height) of the piece when the slots were packed
+        self.inventory_fits = True # False if the slots overflow the inventory area
         
         self.init_hexagon_grid()
-        self.generate_random_pieces() 
+        self.generate_random_pieces(level_id)
+        
+        # UI Elements
+        self.layout_buttons()
         
-        # Calculate graphic dimensions and layout inventory iteratively to fit
+        # Calculate graphic dimensions and layout inventory to fit (clear of the buttons)
         self.fit_graphics_and_layout()
         
         # Solver Generator
+        self.solver = None
         self.solver_iter = self.solve_generator()
         self.solved = False
-        self.start_time = 0 # Will be set when solving starts
-        self.solution_time = 0
+        self.solution_time = 0 # Compute time of the last solve (excludes rendering and throttling)
+        self.replaying = False # True while an "instant" solution is being replayed
+        self.background_solver = None # Worker thread in "background" mode
+        self.progress_version = -1 # Last background progress snapshot applied to the board
+        self.solver_stats = None # SolverStats of the last finished solve
+        self.solver_error = None # Message of the last background solve that failed, shown as the status
         
-        # UI Elements
+        # Completion Animation State
+        self.completion_animation_active = False
+        self.completion_animation_start = 0
+        self.completion_phase = "text"  # "text" -> "explode" -> "done"
+        self.completion_particles = ParticleSystem() # Pooled, reused by every explosion
+        self.completion_letter_data = []  # Stores (char, x, y, color, font_surface)
+        self.completion_font = pygame.font.SysFont("Arial", 120, bold=True)
+
+        # Render cache (see draw)
+        self.static_layer = None # Off-screen surface with the static layers
+        self.static_layer_key_drawn = None # static_layer_key() of its content
+        self.dirty_rects = [] # Screen regions of the dynamic elements of the last frame
+        self.full_redraw = True # Repaint the whole screen on the next frame
+
+    def layout_buttons(self):
+        """
+        Place the "Solve It" and "Reset" buttons in the bottom right corner.
+        The inventory layout keeps pieces clear of them (see inventory_obstacles).
+        """
         button_w, button_h = 160, 50
         self.solve_button_rect = pygame.Rect(
             self.width - button_w - 20, 
@@ -83,14 +155,6 @@ class HexGame:
             self.height - button_h - 20 - button_h - 20, # Above solve button
             button_w, button_h
         )
-        
-        # Completion Animation State
-        self.completion_animation_active = False
-        self.completion_animation_start = 0
-        self.completion_phase = "text"  # "text" -> "explode" -> "done"
-        self.completion_particles = []
-        self.completion_letter_data = []  # Stores (char, x, y, color, font_surface)
-        self.completion_font = pygame.font.SysFont("Arial", 120, bold=True)
 
     def calc_metrics(self, scale_h=None):
         """
@@ -141,350 +205,460 @@ class HexGame:
         self.offset_x = game_area_center_x - grid_pixel_width / 2 - (grid_left_col * self.tri_w / 2)
         self.offset_y = screen_center_y - grid_pixel_height / 2 - (grid_top_row * self.tri_h)
 
+        # The scale changed: per-cell screen tables are rebuilt on next use (see geometry),
+        # piece sprites are rendered again and inventory slots are packed again
+        self._geometry = None
+        self.piece_sprites = {}
+        self.inventory_slots = None
+        # Inventory pieces bucketed by screen area, filled by render_static_layer.
+        # Cells of about one piece keep each piece in a few buckets.
+        self.piece_index = SpatialGrid(2 * self.tri_w)
+
+    @property
+    def geometry(self):
+        """
+        Screen geometry tables of the board at the current scale (see GridGeometry).
+        Built lazily, so fit_graphics_and_layout, which measures the pieces at full scale first, only pays for the final scale.
+        """
+        if self._geometry is None or self._geometry.board is not self.board:
+            self._geometry = GridGeometry(self.board, self.tri_w, self.tri_h, self.offset_x, self.offset_y)
+        return self._geometry
+
     def fit_graphics_and_layout(self):
         """
-        Iteratively adjusts the scale to ensure both the grid and the inventory pieces fit on screen.
+        Finds the largest scale at which both the grid and the inventory pieces fit
+        on screen, then lays the inventory out at that scale.
+
+        The piece sizes are proportional to the scale, so they are measured once at
+        full scale and the scale is found by a binary search over the packing alone
+        (see packing.largest_fitting_scale), without laying the pieces out at each step.
         """
         # Initial available size
         avail_h = self.height * 0.9
-        
-        # Loop to reduce size if inventory overflows
-        valid_layout = False
-        scale_factor = 1.0
-        min_scale = 0.3
-        
-        while not valid_layout and scale_factor >= min_scale:
-            self.calc_metrics(scale_h=avail_h * scale_factor)
-            valid_layout = self.layout_inventory()
-            if not valid_layout:
-                scale_factor -= 0.05
-        
-        if not valid_layout:
+
+        # Piece sizes at full scale
+        self.calc_metrics(scale_h=avail_h)
+        _, _, inv_width, inv_height = self.inventory_area()
+        sizes = [self.inventory_size(piece) for piece in self.pieces]
+        fit = largest_fitting_scale(sizes, inv_width, inv_height, INVENTORY_PADDING, MIN_SCALE, 1.0,
+                                    obstacles=self.inventory_obstacles())
+
+        if fit is None:
             print("Warning: Could not fit pieces perfectly even at minimum scale.")
+            self.calc_metrics(scale_h=avail_h * MIN_SCALE)
+        else:
+            scale_factor, slots = fit
+            self.calc_metrics(scale_h=avail_h * scale_factor)
+            # The search already packed the pieces at that scale
+            self.set_inventory_slots(slots, True)
+        self.layout_inventory()
 
-    def layout_inventory(self):
+    def inventory_area(self):
         """
-        Calculates screen positions for all unplaced pieces in the inventory area.
-        Returns True if they all fit, False otherwise.
+        Screen area where inventory pieces are laid out.
+
+        Returns:
+            tuple: (x, y, width, height)
         """
         inv_start_x = self.width * (1 - INVENTORY_RATIO) + 30
         inv_width = self.width * INVENTORY_RATIO - 60
         inv_start_y = 50
-        
-        current_inv_x = inv_start_x
-        current_inv_y = inv_start_y
-        current_row_h = 0
-        
-        for piece in self.pieces:
-            if piece['placed']: continue
-            
-            # Calculate piece dimensions using current self.tri_w/h
-            normalized = piece['shape']
-            drs = [p[0] for p in normalized]
-            dcs = [p[1] for p in normalized]
-            p_h = (max(drs) - min(drs) + 1) * self.tri_h
-            
-            # Width calculation: (max_col - min_col) * half_w + triangle_width
-            # triangle_width = 2 * half_w
-            # So width = (max - min) * half + 2 * half = (max - min + 2) * half
-            half_w = self.tri_w / 2
-            p_w = (max(dcs) - min(dcs) + 2) * half_w
-            
-            # Check width fit
-            if current_inv_x + p_w > inv_start_x + inv_width:
-                 # New row
-                current_inv_x = inv_start_x
-                current_inv_y += current_row_h + 10 # reduced padding
-                current_row_h = 0
-            
-            # Assign position
-            # We want the *visual left* of the piece to be at current_inv_x
-            # Visual left is at: px + min(dcs) * half_w
-            # So: px + min(dcs) * half_w = current_inv_x
-            # => px = current_inv_x - min(dcs) * half_w
-            px = current_inv_x - min(dcs) * half_w
-            py = current_inv_y
-            
+        return inv_start_x, inv_start_y, inv_width, self.height - 20 - inv_start_y
+
+    def inventory_obstacles(self):
+        """
+        Regions of the inventory area covered by the buttons, relative to the area.
+        Pieces are kept clear of them so they can always be clicked.
+
+        Returns:
+            list: (x, y, width, height) rectangles.
+        """
+        inv_start_x, inv_start_y, _, _ = self.inventory_area()
+        return [
+            (rect.x - inv_start_x, rect.y - inv_start_y, rect.w, rect.h)
+            for rect in (self.solve_button_rect, self.reset_button_rect)
+        ]
+
+    def inventory_size(self, piece):
+        """
+        Size of the bounding box of a piece at the current scale. Flipping a piece
+        does not change it.
+
+        Args:
+            piece (dict): The piece.
+
+        Returns:
+            tuple: (width, height) in pixels.
+        """
+        drs = [p[0] for p in piece['shape']]
+        dcs = [p[1] for p in piece['shape']]
+        # Width calculation: (max_col - min_col) * half_w + triangle_width
+        # triangle_width = 2 * half_w
+        # So width = (max - min) * half + 2 * half = (max - min + 2) * half
+        return (max(dcs) - min(dcs) + 2) * self.tri_w / 2, (max(drs) - min(drs) + 1) * self.tri_h
+
+    def layout_inventory(self):
+        """
+        Calculates screen positions for all pieces in the inventory area.
+        Returns True if they all fit, False otherwise.
+
+        Every piece owns a slot, placed or not, so that a piece going back to the
+        inventory never moves the others. Slots are packed after calc_metrics (a
+        new scale or a new level, see packing.skyline_pack), and again when an
+        unplaced piece no longer has the size of its slot: flipping a piece keeps
+        its size, but a solver allowed to rotate pieces (SOLVER_ALL_ORIENTATIONS)
+        leaves them in another orientation. Otherwise only the unplaced pieces
+        whose position in their slot changed (flipped pieces) are moved.
+        """
+        if self.inventory_slots is not None and any(
+            not piece['placed'] and self.inventory_size(piece) != size
+            for piece, size in zip(self.pieces, self.inventory_slot_sizes)
+        ):
+            self.inventory_slots = None # A rotated piece would overlap its neighbors
+
+        if self.inventory_slots is None:
+            sizes = [self.inventory_size(piece) for piece in self.pieces]
+            _, _, inv_width, inv_height = self.inventory_area()
+            obstacles = self.inventory_obstacles()
+            slots = skyline_pack(sizes, inv_width, inv_height, INVENTORY_PADDING, obstacles)
+            fits = slots is not None
+            if not fits:
+                # Overflow below the inventory rather than leave pieces without a slot
+                slots = skyline_pack(sizes, inv_width, math.inf, INVENTORY_PADDING, obstacles)
+            self.set_inventory_slots(slots, fits)
+
+        half_w = self.tri_w / 2
+        for piece, (slot_x, slot_y) in zip(self.pieces, self.inventory_slots):
+            if piece['placed'] and piece['reset_pos'] is not None:
+                continue # Placed pieces cannot be flipped, their slot position is still valid
+            # We want the *visual top left* of the piece at the slot corner
+            # Visual left is at: px + min(dcs) * half_w (and visual top at py + min(drs) * tri_h)
+            # => px = slot_x - min(dcs) * half_w
+            min_dr = min(p[0] for p in piece['shape'])
+            min_dc = min(p[1] for p in piece['shape'])
+            reset_pos = (slot_x - min_dc * half_w, slot_y - min_dr * self.tri_h)
+            if reset_pos == piece['reset_pos']:
+                continue
+
             # Piece specific: Update its reset_pos and screen_pos
-            piece['reset_pos'] = (px, py)
+            piece['reset_pos'] = reset_pos
             if not piece['placed'] and piece is not self.dragging_piece:
-                piece['screen_pos'] = (px, py)
-            
-            # Advance cursors
-            current_inv_x += p_w + 10 # reduced padding
-            current_row_h = max(current_row_h, p_h)
-            
-        # Check if we overflowed height
-        total_h = current_inv_y + current_row_h
-        if total_h > self.height - 20:
-            return False
-        return True
+                piece['screen_pos'] = reset_pos
+
+        return self.inventory_fits
+
+    def set_inventory_slots(self, slots, fits):
+        """
+        Replace the inventory slots. Every piece is moved to its new slot by the
+        next layout_inventory.
+
+        Args:
+            slots (list): Piece index -> (x, y) slot corner, relative to the inventory area.
+            fits (bool): False if the slots overflow the inventory area.
+        """
+        inv_start_x, inv_start_y, _, _ = self.inventory_area()
+        self.inventory_slots = [(inv_start_x + x, inv_start_y + y) for x, y in slots]
+        self.inventory_slot_sizes = [self.inventory_size(piece) for piece in self.pieces]
+        self.inventory_fits = fits
+        for piece in self.pieces:
+            piece['reset_pos'] = None
+
+    @property
+    def grid(self):
+        """
+        The logical grid of the current board: (row, col) -> piece id or None.
+        """
+        return self.board.grid
 
     def init_hexagon_grid(self):
         """
-        Initialize the hexagonal grid coordinates.
-        The grid is represented as a dictionary where keys are (row, col) tuples.
-        
-        The grid structure creates a large hexagon composed of smaller triangles.
-        It does this by stacking rows of varying lengths (number of triangles).
-        Rows start shorter at the top, widen to the middle, and narrow again at the bottom.
+        Create a fresh, empty hexagonal board of the configured side.
         """
-        self.grid = {}
-        
-        # Calculate the maximum width of the hexagon (the middle rows).
-        # Formula breakdown:
-        # (2 * self.side + 1): The base width (number of triangles) of the top/bottom rows.
-        # 2 * (self.side - 1): The total expansion width added to reach the middle.
-        # For side=3: Base=7, Expansion=4, Max Width=11.
-        max_row_width = (2 * self.side + 1) + 2 * (self.side - 1)
-        
-        total_rows = self.side * 2
-        
-        for row_index in range(total_rows):
-            # Calculate how many triangles (columns) should be in this row.
-            
-            # Upper Half (and middle-upper): Width increases by 2 each step
-            if row_index < self.side:
-                # Start with the base width and add 2 triangles for each row down (1 on each side)
-                num_triangles = (2 * self.side + 1) + 2 * row_index
-            
-            # Lower Half: Width decreases
-            else:
-                # Calculate distance from the bottom to mirror the top half logic
-                # (total_rows - 1) is the index of the last row
-                rows_from_bottom = (total_rows - 1) - row_index
-                num_triangles = (2 * self.side + 1) + 2 * rows_from_bottom
-            
-            # Calculate the horizontal offset (indentation) to center this row relative to the max width.
-            # Shorter rows need more offset to be centered.
-            col_offset = (max_row_width - num_triangles) // 2
-            
-            # Populate the grid with coordinates for this row
-            for k in range(num_triangles):
-                col_index = col_offset + k
-                # Initialize the cell with None (indicating no piece is placed here yet)
-                self.grid[(row_index, col_index)] = None
+        self.board = HexBoard(self.side)
 
     def get_neighbors(self, r, c):
         """
-        Get the neighbors of a given cell in the grid.
-        
-        Args:
-            r (int): Row index.
-            c (int): Column index.
-            
-        Returns:
-            list: List of (row, col) tuples representing neighbor coordinates.
+        Get the neighbors of a given cell in the grid (see HexBoard.get_neighbors).
         """
-        neighs = [(r, c-1), (r, c+1)]
-        if (r + c) % 2 == 0: 
-            neighs.append((r + 1, c))
-        else:
-            neighs.append((r - 1, c))
-        return neighs
+        return self.board.get_neighbors(r, c)
 
-    def generate_random_pieces(self):
+    def generate_random_pieces(self, level_id=None):
         """
-        Generate random puzzle pieces to fill the grid.
-        
-        This algorithm works by:
-        1. Starting with a full grid of available cells.
-        2. Randomly selecting an empty cell to start a new piece.
-        3. "Growing" the piece by randomly adding unvisited neighbors until a desired size is reached.
-        4. Repeating this process until the entire grid is covered.
-        5. If the random generation leaves tiny gaps (< 3 cells) or fails, it restarts from scratch.
+        Generate random puzzle pieces that exactly cover the current board.
+
+        Args:
+            level_id (str, optional): Level to generate. If None, a random level is read
+                from the level pack if any, else a new random ID is drawn, among the
+                levels of the configured difficulty if any.
         """
-        while True:
-            # 1. Reset: Treat all grid cells as unvisited (None)
-            for k in self.grid: 
-                self.grid[k] = None
-            
+        self.level_difficulty = None
+        if level_id is None and self.pack is not None and self.pack.side == self.side:
+            # Pre-generated level: no generation or scoring at all
+            level = self.pack.random_level()
+            self.level_id = level.level_id
+            self.level_difficulty = level.difficulty
+            self.pieces = level.pieces
+            return
+        if level_id is None and self.difficulty:
+            # Random candidates are scored with the solver until one falls in the band, and
+            # unique levels take seconds to minutes: both are generated on a worker thread
+            # and the board stays empty until it is done (see poll_generator)
+            self.level_id = None
             self.pieces = []
-            
-            # List of all coordinates in the grid
-            all_coordinates = list(self.grid.keys())
-            
-            # Shuffle to ensure random piece shapes and placement order
-            random.shuffle(all_coordinates)
-            
-            # Temporary grid to track piece assignment during generation
-            # Key: (row, col), Value: Piece ID or None
-            generation_grid = {k: None for k in all_coordinates}
-            
-            piece_id = 0
-            generation_failed = False
-            
-            # Keep a working list of coordinates to pick start points from
-            unprocessed_coordinates = list(all_coordinates)
-            
-            while unprocessed_coordinates:
-                # 2. Pick a starting cell for the new piece
-                start_cell = unprocessed_coordinates.pop()
-                
-                # Ensure the start cell hasn't been taken by a previous piece
-                # (It might have been added to a piece but not removed from this list yet)
-                while start_cell not in generation_grid or generation_grid[start_cell] is not None:
-                    if not unprocessed_coordinates: 
-                        break
-                    start_cell = unprocessed_coordinates.pop()
-                
-                # If we've processed everything, stop
-                if generation_grid.get(start_cell) is not None: 
-                    continue
-    
-                # 3. Determine random size (6-9 triangles is a good puzzle piece size)
-                target_piece_size = random.randint(6, 9)
-                
-                # Start building the piece
-                current_piece_cells = [start_cell]
-                generation_grid[start_cell] = piece_id
-                
-                # Set of potential neighboring cells to expand into
-                potential_neighbors = set()
-                
-                def add_valid_neighbors(row_index, col_index):
-                    """
-                    Helper to add unvisited neighbors to the candidate set.
-                    
-                    Args:
-                        row_index (int): The row index of the cell whose neighbors we want to check.
-                        col_index (int): The column index of the cell whose neighbors we want to check.
-                    """
-                    for neighbor_cell in self.get_neighbors(row_index, col_index):
-                        # Only add if neighbor exists in grid and is not yet assigned
-                        if neighbor_cell in generation_grid and generation_grid[neighbor_cell] is None: 
-                            potential_neighbors.add(neighbor_cell)
-    
-                add_valid_neighbors(*start_cell)
-                
-                # Grow the piece
-                while len(current_piece_cells) < target_piece_size and potential_neighbors:
-                    # Pick a random neighbor to attach
-                    next_cell = random.choice(list(potential_neighbors))
-                    potential_neighbors.remove(next_cell)
-                    
-                    # Double check it's still free (should be)
-                    if generation_grid[next_cell] is None:
-                        generation_grid[next_cell] = piece_id
-                        current_piece_cells.append(next_cell)
-                        
-                        # Add NEW neighbors from this new cell
-                        add_valid_neighbors(*next_cell)
-                        
-                        # Optimization: Remove from global unprocessed list if present
-                        if next_cell in unprocessed_coordinates: 
-                            unprocessed_coordinates.remove(next_cell)
-                
-                # 4. Check for failure conditions (tiny leftover pieces)
-                if len(current_piece_cells) < 3:
-                     generation_failed = True
-                     break
-
-                # 5. Finalize the piece
-                if current_piece_cells:
-                    # Normalize coordinates relative to top-left-most cell (reference)
-                    # min() works lexographically: lowest row, then lowest col
-                    ref_row, ref_col = min(current_piece_cells)
-                    
-                    relative_shape_coords = [(r - ref_row, c - ref_col) for r, c in current_piece_cells]
-                    
-                    # Assign a color
-                    color = PIECE_COLORS_RGB[piece_id % len(PIECE_COLORS_RGB)]
-                    
-                    # Calculate "Anchor Parity"
-                    # This tracks whether the reference cell (0,0 in relative terms) points UP or DOWN.
-                    # Essential for correctly rendering the shape if it's rotated later.
-                    anchor_parity = (ref_row + ref_col) % 2
-
-                    # Store piece object
-                    # Positions will be set physically by 'layout_inventory' later.
-                    new_piece_obj = {
-                        'id': piece_id, 
-                        'shape': relative_shape_coords, 
-                        'color': color, 
-                        'placed': False,
-                        'anchor_parity': anchor_parity,
-                        'screen_pos': (0, 0),
-                        'reset_pos': (0, 0),
-                        'rect': None
-                    }
-                    # The 'rect' property stores the bounding box (pygame.Rect) of the piece on screen.
-                    # It is calculated dynamically during rendering (in the draw() method) and used by the
-                    # get_piece_under_mouse() method to detect if the mouse cursor is hovering over or clicking on this piece.
-                    # Initially it is set to None since the piece hasn't been drawn yet.
-                    
-                    self.pieces.append(new_piece_obj)
-                    piece_id += 1
-            
-            # If generation was successful, exit the outer retry loop
-            if not generation_failed: 
-                break
-        
-        # Cleanup: Reset the main grid logical state to empty
-        for k in self.grid: 
-            self.grid[k] = None
+            self.generator = BackgroundGenerator(side=self.side, difficulty=self.difficulty, unique=self.unique)
+            self.generator.start()
+            return
+        self.level_id = level_id or make_level_id(self.side, unique=self.unique)
+        if parse_level_id(self.level_id)[2]:
+            self.pieces = []
+            self.generator = BackgroundGenerator(self.level_id)
+            self.generator.start()
+            return
+        _, self.pieces = generate_level(self.level_id, self.board)
+
+    def stop_generator(self):
+        """
+        Cancel the level generation, if any, and wait for its thread to exit.
+        """
+        if self.generator is not None:
+            self.generator.cancel()
+            self.generator = None
+
+    def poll_generator(self):
+        """
+        Install the level of the generator thread once it is done. Never blocks.
+        """
+        level = self.generator.result
+        if level is None:
+            return
+        self.generator = None
+        if level.error is not None:
+            print(f"Warning: {level.error}, using a random level.")
+            self.level_id = make_level_id(self.side)
+            _, self.pieces = generate_level(self.level_id, self.board)
+        else:
+            self.level_id = level.level_id
+            self.level_difficulty = level.difficulty
+            self.pieces = level.pieces
+        self.fit_graphics_and_layout()
+        self.solver_iter = self.solve_generator()
 
     def screen_to_grid(self, x, y, required_parity=None):
         """
-        Convert screen coordinates to approximate grid coordinates.
-        This is a heuristic approach finding the closest cell center.
+        Convert screen coordinates to grid coordinates.
+        Finds the cell containing the point, or else the closest cell center of the
+        required parity, in constant time (see GridGeometry.nearest_cell).
         
         Args:
             x (float): Screen x coordinate.
             y (float): Screen y coordinate.
             required_parity (int, optional): If set, only returns cells with (r+c)%2 == parity.
+
+        Returns:
+            tuple: The (row, col) cell, or None if the point is too far from the board.
         """
-        best_dist = float('inf')
-        best_cell = None
-        
-        # Optimize by only checking valid grid centers
-        for r, c in self.grid.keys():
-            # Filter by parity to prevent shape mutation
-            if required_parity is not None and (r + c) % 2 != required_parity:
-                continue
-                
-            # Get center of this cell
-            points = self.get_triangle_points(r, c)
-            # Centroid approx
-            cx = sum(p[0] for p in points) / 3
-            cy = sum(p[1] for p in points) / 3
-            
-            dist = math.hypot(x - cx, y - cy)
-            if dist < self.tri_w: # Threshold
-                if dist < best_dist:
-                    best_dist = dist
-                    best_cell = (r, c)
-        
-        return best_cell
+        # Analytic lattice inverse, filtered by parity to prevent shape mutation
+        return self.geometry.nearest_cell(x, y, parity=required_parity)
 
     def reset_grid(self):
         """
         Resets the grid and puts all pieces back in inventory.
         """
-        for k in self.grid: self.grid[k] = None
+        self.board.reset()
         for p in self.pieces:
             p['placed'] = False
             p['screen_pos'] = p['reset_pos']
         self.solved = False
         self.dragging_piece = None
-        # Re-layout inventory just in case
-        self.layout_inventory()
+        # Re-layout inventory just in case (pieces rotated by the solver may not fit anymore)
+        if not self.layout_inventory():
+            self.fit_graphics_and_layout()
         
     def start_solving(self):
         """
         Resets the puzzle and starts the automatic solver.
         """
+        self.stop_background_solver()
         self.reset_grid()
         self.solving = True
-        self.start_time = time.time()
-        self.solver_iter = self.solve_generator()
+        self.solution_time = 0
+        self.solver_stats = None
+        self.solver_error = None
+        if SOLVE_MODE == "background":
+            self.background_solver = BackgroundSolver(
+                self.side, self.pieces, SOLVER_STRATEGY,
+                prune=SOLVER_PRUNE, all_orientations=SOLVER_ALL_ORIENTATIONS, flips=SOLVER_FLIPS,
+                profile=SOLVER_PROFILE, transposition_size=SOLVER_TRANSPOSITION_SIZE
+            )
+            self.progress_version = -1
+            self.background_solver.start()
+        elif SOLVE_MODE == "instant":
+            self.solver_iter = self.solve_instantly()
+        else:
+            self.replaying = False
+            self.solver_iter = self.solve_generator()
+
+    def stop_background_solver(self):
+        """
+        Cancel the background solver, if any, and wait for its thread to exit.
+        """
+        if self.background_solver is not None:
+            self.background_solver.cancel()
+            self.background_solver = None
+
+    def poll_background_solver(self):
+        """
+        Mirror the latest progress snapshot of the background solver on the board.
+        Never blocks: the snapshot is read as a single attribute.
+        """
+        progress = self.background_solver.progress
+        if progress.version == self.progress_version:
+            return
+        self.progress_version = progress.version
+
+        self.board.reset()
+        for p in self.pieces:
+            p['placed'] = False
+        for piece_id, shape, parity, (r, c) in progress.placements:
+            piece = self.pieces[piece_id]
+            piece['shape'] = list(shape)
+            piece['anchor_parity'] = parity
+            self.place_piece(piece, r, c)
+
+        if progress.done:
+            self.solving = False
+            self.finish_solver_stats(self.background_solver.solver.stats)
+            self.background_solver = None
+            if progress.error is not None:
+                self.solver_error = f"Solver failed: {progress.error!r}"
+                print(f"Warning: {self.solver_error}")
+            if progress.solved:
+                self.solved = True
+                self.solution_time = progress.elapsed
+                self.start_completion_animation()
+
+    def solve_instantly(self):
+        """
+        Solve the puzzle off-screen with the headless solver, then prepare a replay.
+        The compute time is stored in solution_time.
+
+        Returns:
+            generator: Places the solution one piece per step, like solve_generator.
+        """
+        solver = make_solver(
+            self.board, self.pieces, SOLVER_STRATEGY, animate=False,
+            prune=SOLVER_PRUNE, all_orientations=SOLVER_ALL_ORIENTATIONS, flips=SOLVER_FLIPS,
+            profile=SOLVER_PROFILE, transposition_size=SOLVER_TRANSPOSITION_SIZE
+        )
+        t0 = time.perf_counter()
+        found = solver.solve()
+        self.solution_time = time.perf_counter() - t0
+        self.finish_solver_stats(solver.stats)
+
+        # Placements in search order; pieces keep the orientation chosen by the solver
+        placements = [(self.pieces[i], anchor) for i, k, anchor in solver.solution]
+        self.board.reset()
+        for p in self.pieces:
+            p['placed'] = False
+
+        self.replaying = True
+        return self.replay_solution(placements) if found else iter(())
+
+    def replay_solution(self, placements):
+        """
+        Coroutine generator placing precomputed placements one at a time.
+
+        Args:
+            placements (list): (piece, (row, col)) pairs.
+
+        Yields:
+            bool: True once every placement is done, False otherwise.
+        """
+        for piece, (r, c) in placements:
+            self.place_piece(piece, r, c)
+            yield False
+        yield True
+
+    def advance_solver(self, budget_ms=None):
+        """
+        Advance the solver coroutine.
+
+        Only the time spent inside the solver is added to solution_time, so the
+        reported time does not depend on the frame rate or on TARGET_DELAY.
+
+        Args:
+            budget_ms (float, optional): Keep stepping until this much time has been
+                spent in this call. If None, a single step is run.
+        """
+        start = time.perf_counter()
+        while True:
+            t0 = time.perf_counter()
+            try:
+                res = next(self.solver_iter)
+            except StopIteration:
+                # Search finished without solution
+                if not self.replaying:
+                    self.finish_solver_stats(self.solver.stats)
+                self.solving = False
+                self.replaying = False
+                return
+            t1 = time.perf_counter()
+            if not self.replaying:
+                self.solution_time += t1 - t0
+
+            if res is True or self.is_solved():
+                if not self.replaying:
+                    if res is not True:
+                        # The board is full but the search is still paused on its last
+                        # placement: let it record the solution and close its statistics
+                        t0 = time.perf_counter()
+                        for res in self.solver_iter:
+                            if res is True:
+                                break
+                        self.solution_time += time.perf_counter() - t0
+                    self.finish_solver_stats(self.solver.stats)
+                self.solved = True
+                self.solving = False
+                self.replaying = False
+                self.start_completion_animation()
+                return
+            if budget_ms is None or (t1 - start) * 1000 >= budget_ms:
+                return
+
+    def finish_solver_stats(self, stats):
+        """
+        Keep the statistics of a finished solve for the overlay and dump them to
+        SOLVER_STATS_FILE if configured.
+
+        Args:
+            stats (SolverStats): Statistics of the solver that just finished.
+        """
+        self.solver_stats = stats
+        if SOLVER_STATS_FILE:
+            stats.to_json(SOLVER_STATS_FILE)
+
+    def live_solver_stats(self):
+        """
+        Get the statistics to display: those of the running animated solver, or
+        those of the last finished solve.
+
+        Returns:
+            SolverStats: The statistics, or None if there is nothing to show.
+        """
+        if self.solving and not self.replaying and self.background_solver is None and self.solver is not None:
+            return self.solver.stats
+        return self.solver_stats
 
     def regenerate_level(self):
         """
         Regenerates a new puzzle level.
         """
+        self.stop_generator()
+        self.stop_background_solver()
         self.solving = False
         self.solved = False
+        self.solver_stats = None
+        self.solver_error = None
         self.dragging_piece = None
         self.hovered_piece = None
         
@@ -495,83 +669,41 @@ class HexGame:
 
     def can_place(self, shapes, r, c):
         """
-        Check if a piece can be placed at the specified coordinates.
-        
-        Args:
-            shapes (list): List of relative coordinates (dr, dc) for the piece shape.
-            r (int): Target row.
-            c (int): Target column.
-            
-        Returns:
-            bool: True if the piece can be placed, False otherwise.
+        Check if a piece can be placed at the specified coordinates (see HexBoard.can_place).
         """
-        for dr, dc in shapes:
-            nr, nc = r + dr, c + dc
-            if (nr, nc) not in self.grid or self.grid[(nr, nc)] is not None: return False
-        return True
+        return self.board.can_place(shapes, r, c)
 
     def place_piece(self, piece, r, c, remove=False):
         """
-        Place or remove a piece from the grid.
-        
-        Args:
-            piece (dict): The piece object to place/remove.
-            r (int): Row coordinate.
-            c (int): Column coordinate.
-            remove (bool): If True, removes the piece (sets grid cells to None).
+        Place or remove a piece from the grid (see HexBoard.place_piece).
         """
-        for dr, dc in piece['shape']:
-            self.grid[(r+dr, c+dc)] = None if remove else piece['id']
-        piece['placed'] = not remove
-        if not remove:
-            piece['grid_pos'] = (r, c)
+        self.board.place_piece(piece, r, c, remove=remove)
 
     def solve_generator(self):
         """
-        Coroutine generator for the backtracking solver.
+        Coroutine generator for the configured solver strategy on the current board.
         Yields control back to the main loop to allow for GUI updates.
-        
+
+        The solver is kept in self.solver so its statistics can be displayed.
+
         Yields:
             bool: True if solved, False if continuing search.
         """
-        # Find empty cell
-        empty_spot = None
-        # Stable sorting for determinism
-        sorted_cells = sorted(self.grid.keys())
-        for cell in sorted_cells:
-            if self.grid[cell] is None:
-                empty_spot = cell
-                break
-        
-        if empty_spot is None:
-            yield True # Solved
-            return
-
-        r, c = empty_spot
-
-        for piece in self.pieces:
-            if not piece['placed']:
-                if self.can_place(piece['shape'], r, c):
-                    self.place_piece(piece, r, c)
-                    yield False # Step done, continue
-                    
-                    # Recursion via 'yield from'
-                    yield from self.solve_generator()
-                    
-                    if self.is_solved(): # Helper check
-                        return 
-                    
-                    self.place_piece(piece, r, c, remove=True)
-                    yield False # Backtrack step
+        self.solver = make_solver(
+            self.board, self.pieces, SOLVER_STRATEGY,
+            prune=SOLVER_PRUNE, all_orientations=SOLVER_ALL_ORIENTATIONS, flips=SOLVER_FLIPS,
+            profile=SOLVER_PROFILE, transposition_size=SOLVER_TRANSPOSITION_SIZE
+        )
+        return self.solver.steps()
 
     def is_solved(self):
         """
         Check if the puzzle is completely solved.
-        
+
         Returns:
             bool: True if all grid cells are filled, False otherwise.
         """
-        return all(v is not None for v in self.grid.values())
+        return self.board.is_solved()
 
     def get_triangle_points(self, r, c):
         """
@@ -582,22 +714,10 @@ class HexGame:
             c (int): Column index.
             
         Returns:
-            list: List of (x, y) tuples for the triangle vertices.
+            list: List of (x, y) tuples for the triangle vertices (a shared table
+                row, not to be modified).
         """
-        half_w = self.tri_w / 2
-        x_base = self.offset_x + c * half_w
-        y_top = self.offset_y + r * self.tri_h
-        y_bot = self.offset_y + (r + 1) * self.tri_h
-        
-        if (r + c) % 2 == 0: # Point UP
-            p1 = (x_base + half_w, y_top)      # Top
-            p2 = (x_base, y_bot)               # Bot Left
-            p3 = (x_base + self.tri_w, y_bot)  # Bot Right
-        else: # Point DOWN
-            p1 = (x_base, y_top)               # Top Left
-            p2 = (x_base + self.tri_w, y_top)  # Top Right
-            p3 = (x_base + half_w, y_bot)      # Bot
-        return [p1, p2, p3]
+        return self.geometry.cell_points(r, c)
 
     def start_completion_animation(self):
         """
@@ -606,7 +726,7 @@ class HexGame:
         self.completion_animation_active = True
         self.completion_animation_start = pygame.time.get_ticks()
         self.completion_phase = "text"
-        self.completion_particles = []
+        self.completion_particles.clear()
         self.completion_letter_data = []
         
         text = "Completed!"
@@ -616,7 +736,7 @@ class HexGame:
         total_width = 0
         for char in text:
             color = random.choice(PIECE_COLORS_RGB)
-            surf = self.completion_font.render(char, True, color)
+            surf = self.text_cache.render(self.completion_font, char, color)
             letter_surfaces.append((char, surf, color))
             total_width += surf.get_width()
         
@@ -633,9 +753,28 @@ class HexGame:
                 'color': color,
                 'surface': surf,
                 'width': surf.get_width(),
-                'height': surf.get_height()
+                'height': surf.get_height(),
+                'pulse': self.render_pulse_steps(surf)
             })
             current_x += surf.get_width()
+
+    def render_pulse_steps(self, surface):
+        """
+        Pre-render the scale steps of the pulse effect of a letter, so the
+        animation frames only pick one instead of smooth-scaling.
+
+        Args:
+            surface (pygame.Surface): The letter at scale 1.
+
+        Returns:
+            list: PULSE_STEPS scaled surfaces, from 0.95x to 1.05x.
+        """
+        width, height = surface.get_size()
+        steps = []
+        for i in range(PULSE_STEPS):
+            scale = 0.95 + 0.1 * i / (PULSE_STEPS - 1)
+            steps.append(pygame.transform.smoothscale(surface, (int(width * scale), int(height * scale))))
+        return steps
     
     def update_completion_animation(self):
         """
@@ -652,22 +791,17 @@ class HexGame:
                 self.completion_phase = "explode"
                 # Create particles from each letter
                 for letter in self.completion_letter_data:
-                    # Create multiple particles per letter
-                    for _ in range(30):
-                        px = letter['x'] + random.uniform(0, letter['width'])
-                        py = letter['y'] + random.uniform(0, letter['height'])
-                        particle = Particle(px, py, letter['color'])
-                        self.completion_particles.append(particle)
+                    # Create multiple particles per letter, spread over its box
+                    self.completion_particles.emit_burst(
+                        letter['x'], letter['y'], letter['width'], letter['height'],
+                        letter['color'], PARTICLES_PER_LETTER
+                    )
                 # Clear letter data so text stops rendering
                 self.completion_letter_data = []
         
         elif self.completion_phase == "explode":
-            # Update all particles
-            for particle in self.completion_particles:
-                particle.update()
-            
-            # Remove dead particles
-            self.completion_particles = [p for p in self.completion_particles if p.is_alive()]
+            # Update all particles in one batch (dead ones are dropped)
+            self.completion_particles.update()
             
             # When all particles are gone, animation is done
             if len(self.completion_particles) == 0:
@@ -686,12 +820,13 @@ class HexGame:
         if self.completion_phase == "text":
             # Draw each letter with a subtle scale pulse effect
             pulse = 1.0 + 0.05 * math.sin(elapsed / 150)
+            # Closest pre-rendered step (pulse spans 0.95 .. 1.05)
+            step = round((pulse - 0.95) / 0.1 * (PULSE_STEPS - 1))
             
             for letter in self.completion_letter_data:
                 # Apply pulse scaling
-                scaled_w = int(letter['width'] * pulse)
-                scaled_h = int(letter['height'] * pulse)
-                scaled_surf = pygame.transform.smoothscale(letter['surface'], (scaled_w, scaled_h))
+                scaled_surf = letter['pulse'][step]
+                scaled_w, scaled_h = scaled_surf.get_size()
                 
                 # Adjust position to keep centered while pulsing
                 offset_x = (letter['width'] - scaled_w) // 2
@@ -701,131 +836,223 @@ class HexGame:
         
         elif self.completion_phase == "explode":
             # Draw all particles
-            for particle in self.completion_particles:
-                particle.draw(self.screen)
+            self.completion_particles.draw(self.screen)
 
-    def draw(self):
+    def piece_sprite(self, piece):
         """
-        Render the game state to the screen.
+        Get the pre-rendered sprite of a piece in its current orientation.
+
+        Sprites are cached by shape, anchor parity and color; the cache is
+        emptied when the scale changes (see calc_metrics), and flipping a piece
+        changes its shape, so it gets another sprite.
+
+        Args:
+            piece (dict): The piece.
+
+        Returns:
+            tuple: (surface, mask, (dx, dy)) where surface is the sprite with a
+                transparent background, mask its pygame.mask.Mask of opaque pixels,
+                and (dx, dy) the offset of the sprite from the reference cell box.
+        """
+        key = (tuple(piece['shape']), piece['anchor_parity'], piece['color'])
+        sprite = self.piece_sprites.get(key)
+        if sprite is None:
+            sprite = self.piece_sprites[key] = self.render_piece_sprite(piece)
+        return sprite
+
+    def render_piece_sprite(self, piece):
         """
-        self.screen.fill(BG_COLOR)
+        Render a piece once into its own surface (see piece_sprite).
+        """
+        # Construct shape polygon for drawing relative to the reference cell box
+        # We need to reconstruct the visual shape from logical 'shape'
+        # This is tricky because logic is (dr, dc) but pixels depend on orientation.
+        triangle_offsets = self.geometry.triangle_offsets
+        half_w = self.tri_w / 2
+        drs = [dr for dr, dc in piece['shape']]
+        dcs = [dc for dr, dc in piece['shape']]
+        
+        # Bounding box relative to the reference cell box (every triangle spans its
+        # whole cell box), plus a 1 pixel margin for the outlines
+        left = min(dcs) * half_w - 1
+        top = min(drs) * self.tri_h - 1
+        width = (max(dcs) - min(dcs) + 2) * half_w + 2
+        height = (max(drs) - min(drs) + 1) * self.tri_h + 2
+        surface = pygame.Surface((math.ceil(width), math.ceil(height)), pygame.SRCALPHA)
+
+        for dr, dc in piece['shape']:
+            # Calculate proper visual offset for each triangle
+            base_x = dc * half_w - left
+            base_y = dr * self.tri_h - top
+            
+            # Determine orientation based on original grid parity
+            # logic: if (r+c)%2 == 0 it's point UP. using relative coords:
+            # relative parity = (dr + dc) % 2.
+            # Combined with anchor parity: (anchor_parity + relative_parity) % 2
+            # But wait, (ref_r + ref_c + dr + dc) % 2 = (parity + dr + dc) % 2
+            parity = (piece['anchor_parity'] + dr + dc) % 2 # 0: point UP
+            
+            # The vertex offsets of UP/DOWN triangles from the top-left of a cell box
+            # are precomputed for the current scale (see GridGeometry.triangle_offsets)
+            points = [(base_x + ox, base_y + oy) for ox, oy in triangle_offsets[parity]]
+            pygame.draw.polygon(surface, piece['color'], points)
+            # Optional border for pieces
+            pygame.draw.polygon(surface, BG_COLOR, points, 1)
+
+        return surface, pygame.mask.from_surface(surface), (left, top)
+
+    def draw_piece(self, surface, piece, px, py):
+        """
+        Draw an unplaced piece with its reference cell box at (px, py): a single
+        blit of its cached sprite.
+
+        Args:
+            surface (pygame.Surface): Target surface.
+            piece (dict): The piece.
+            px (float): Screen x of the piece reference cell box.
+            py (float): Screen y of the piece reference cell box.
+
+        Returns:
+            pygame.Rect: Bounding box of the drawn piece (the sprite, outline margin included).
+        """
+        sprite, _, (dx, dy) = self.piece_sprite(piece)
+        return surface.blit(sprite, (round(px + dx), round(py + dy)))
+
+    def static_layer_key(self):
+        """
+        Summary of everything drawn on the static layer. The layer is rebuilt
+        whenever it changes.
+
+        Returns:
+            tuple: Board identity and version, geometry tables, and the state of
+                the pieces that are not being dragged.
+        """
+        pieces = tuple(
+            (piece['id'], piece['placed'], piece['screen_pos'], tuple(piece['shape']), piece['anchor_parity'])
+            for piece in self.pieces if piece is not self.dragging_piece
+        )
+        return (id(self.board), self.board.version, id(self.geometry), id(self.pieces), pieces)
+
+    def render_static_layer(self):
+        """
+        Draw the layers that only change with the game state into an off-screen
+        surface: background, inventory panel, grid outline, placed cells and idle
+        inventory pieces. Also refreshes the 'rect' of the idle pieces and the
+        spatial index used to pick them (see get_piece_under_mouse).
+        """
+        if self.static_layer is None:
+            self.static_layer = pygame.Surface((self.width, self.height)).convert()
+        layer = self.static_layer
+        layer.fill(BG_COLOR)
         
         # Draw Inventory Background
         inv_rect = pygame.Rect(self.width * (1 - INVENTORY_RATIO), 0, self.width * INVENTORY_RATIO, self.height)
-        pygame.draw.rect(self.screen, INVENTORY_BG_COLOR, inv_rect)
+        pygame.draw.rect(layer, INVENTORY_BG_COLOR, inv_rect)
         
         # Draw Divider Line
         line_x = self.width * (1 - INVENTORY_RATIO)
-        pygame.draw.line(self.screen, GRID_COLOR, (line_x, 0), (line_x, self.height), 3)
+        pygame.draw.line(layer, GRID_COLOR, (line_x, 0), (line_x, self.height), 3)
         
-        # Draw Grid Cells
-        for (r, c), pid in self.grid.items():
-            points = self.get_triangle_points(r, c)
-            
+        # Draw Grid Cells (vertices come from the precomputed tables, in bit order)
+        grid = self.grid
+        for cell, points in zip(self.board.cells, self.geometry.points):
+            pid = grid[cell]
             if pid is not None:
                 color = self.pieces[pid]['color']
-                pygame.draw.polygon(self.screen, color, points)
+                pygame.draw.polygon(layer, color, points)
             else:
-                pygame.draw.polygon(self.screen, GRID_COLOR, points, 1)
+                pygame.draw.polygon(layer, GRID_COLOR, points, 1)
 
-        # Draw Pieces (Inventory or Dragging)
+        # Draw Inventory Pieces (the dragged piece is drawn every frame by draw())
+        self.piece_index.clear()
         for piece in self.pieces:
-            if piece['placed']: continue
-            
-            # Position to draw: mouse pos if dragging, else inventory pos
-            if piece is self.dragging_piece:
-                dx, dy = self.drag_offset
-                mx, my = pygame.mouse.get_pos()
-                px, py = mx + dx, my + dy
-            else:
-                px, py = piece['screen_pos']
-            
-            # Construct shape polygon for drawing relative to (px, py)
-            # We need to reconstruct the visual shape from logical 'shape'
-            # This is tricky because logic is (dr, dc) but pixels depend on orientation.
-            # We will use a simplified relative drawing: treat (px,py) as center of piece(0,0)
-            
-            # Update rect for collision detection (only if not dragging, or update while dragging too)
-            # Calculate bounding box
-            min_x, max_x, min_y, max_y = float('inf'), float('-inf'), float('inf'), float('-inf')
-
-            for dr, dc in piece['shape']:
-                # Calculate proper visual offset for each triangle
-                off_x = dc * (self.tri_w * 0.5)
-                off_y = dr * self.tri_h
-                
-                # Determine orientation based on original grid parity
-                # logic: if (r+c)%2 == 0 it's point UP. using relative coords:
-                # relative parity = (dr + dc) % 2.
-                # Combined with anchor parity: (anchor_parity + relative_parity) % 2
-                # But wait, (ref_r + ref_c + dr + dc) % 2 = (parity + dr + dc) % 2
-                
-                is_point_up = (piece['anchor_parity'] + dr + dc) % 2 == 0
-                
-                base_x = px + off_x
-                base_y = py + off_y
-                
-                # Draw Triangle for UI
-                # We need points relative to base_x, base_y (which is roughly top-left of specific cell space)
-                # Let's reuse get_triangle_points logic but adapted for arbitrary screen pos
-                
-                half_w = self.tri_w / 2
-                
-                if is_point_up: # Point UP
-                    p1 = (base_x + half_w, base_y)           # Top
-                    p2 = (base_x, base_y + self.tri_h)       # Bot Left
-                    p3 = (base_x + self.tri_w, base_y + self.tri_h) # Bot Right
-                else: # Point DOWN
-                    p1 = (base_x, base_y)                    # Top Left
-                    p2 = (base_x + self.tri_w, base_y)       # Top Right
-                    p3 = (base_x + half_w, base_y + self.tri_h)   # Bot
-                
-                pygame.draw.polygon(self.screen, piece['color'], [p1, p2, p3])
-                # Optional border for pieces
-                pygame.draw.polygon(self.screen, BG_COLOR, [p1, p2, p3], 1)
-                
-                # Update Bounding Box
-                xs = [p[0] for p in [p1, p2, p3]]
-                ys = [p[1] for p in [p1, p2, p3]]
-                min_x = min(min_x, min(xs))
-                max_x = max(max_x, max(xs))
-                min_y = min(min_y, min(ys))
-                max_y = max(max_y, max(ys))
-
+            if piece['placed'] or piece is self.dragging_piece:
+                continue
             # Update bounding rect for interaction
-            piece['rect'] = pygame.Rect(min_x, min_y, max_x - min_x, max_y - min_y)
+            piece['rect'] = self.draw_piece(layer, piece, *piece['screen_pos'])
+            self.piece_index.insert(piece, piece['rect'])
+
+    def draw(self):
+        """
+        Render the game state to the screen.
+
+        The static layer is only redrawn when its content changed (see
+        static_layer_key). Otherwise it is just blitted back over the regions
+        covered by the previous frame's dynamic elements (dragged piece, buttons,
+        texts, tooltip), those are drawn again, and only the dirty regions are
+        sent to the display. The completion animation repaints the whole screen.
+        """
+        key = self.static_layer_key()
+        full_redraw = key != self.static_layer_key_drawn or self.completion_animation_active or self.full_redraw
+        if key != self.static_layer_key_drawn:
+            self.render_static_layer()
+            self.static_layer_key_drawn = key
+        if full_redraw:
+            self.screen.blit(self.static_layer, (0, 0))
+        else:
+            # Erase the dynamic elements of the previous frame
+            for rect in self.dirty_rects:
+                self.screen.blit(self.static_layer, rect, rect)
+        dirty = []
+        mouse_pos = pygame.mouse.get_pos()
+
+        # Draw the dragged piece at the mouse position
+        if self.dragging_piece is not None and not self.dragging_piece['placed']:
+            dx, dy = self.drag_offset
+            mx, my = mouse_pos
+            # The rect keeps following the piece so it can be picked up again once dropped
+            self.dragging_piece['rect'] = self.draw_piece(self.screen, self.dragging_piece, mx + dx, my + dy)
+            dirty.append(self.dragging_piece['rect'])
 
         # Draw "Solve It" Button
-        color = BUTTON_HOVER_COLOR if self.solve_button_rect.collidepoint(pygame.mouse.get_pos()) else BUTTON_COLOR
-        pygame.draw.rect(self.screen, color, self.solve_button_rect, border_radius=10)
+        color = BUTTON_HOVER_COLOR if self.solve_button_rect.collidepoint(mouse_pos) else BUTTON_COLOR
+        dirty.append(pygame.draw.rect(self.screen, color, self.solve_button_rect, border_radius=10))
         
-        btn_txt = self.font.render("SOLVE IT", True, BUTTON_TEXT_COLOR)
+        btn_txt = self.text_cache.render(self.font, "SOLVE IT", BUTTON_TEXT_COLOR)
         txt_rect = btn_txt.get_rect(center=self.solve_button_rect.center)
         self.screen.blit(btn_txt, txt_rect)
 
         # Draw "Reset" Button
         color_r = (200, 70, 70) # Red
         color_r_hover = (220, 90, 90)
-        draw_color_r = color_r_hover if self.reset_button_rect.collidepoint(pygame.mouse.get_pos()) else color_r
-        pygame.draw.rect(self.screen, draw_color_r, self.reset_button_rect, border_radius=10)
+        draw_color_r = color_r_hover if self.reset_button_rect.collidepoint(mouse_pos) else color_r
+        dirty.append(pygame.draw.rect(self.screen, draw_color_r, self.reset_button_rect, border_radius=10))
         
-        reset_txt = self.font.render("RESET", True, BUTTON_TEXT_COLOR)
+        reset_txt = self.text_cache.render(self.font, "RESET", BUTTON_TEXT_COLOR)
         reset_rect = reset_txt.get_rect(center=self.reset_button_rect.center)
         self.screen.blit(reset_txt, reset_rect)
 
         # Info text
-        status = "SOLVED!" if self.solved else ("Solving..." if self.solving else "Manual Mode")
+        status = "SOLVED!" if self.solved else ("Solving..." if self.solving else self.solver_error or "Manual Mode")
+        if self.generator is not None:
+            status = "Generating level..."
+        if self.solving and self.background_solver is not None:
+            progress = self.background_solver.progress
+            status += (f" {progress.nodes_per_sec:,.0f} nodes/s | depth {progress.depth}"
+                       f" | backtracks {progress.backtracks:,}")
         if self.solved:
             ts = f"Time: {self.solution_time:.2f}s"
-            txt = self.font.render(f"{status} {ts}", True, (50, 255, 50))
+            txt = self.text_cache.render(self.font, f"{status} {ts}", (50, 255, 50))
         else:
-            txt = self.font.render(status, True, TEXT_COLOR)
+            txt = self.text_cache.render(self.font, status, TEXT_COLOR)
         
-        self.screen.blit(txt, (20, 20))
+        dirty.append(self.screen.blit(txt, (20, 20)))
+
+        # Solver statistics overlay (below the status text)
+        stats = self.live_solver_stats() if SHOW_SOLVER_STATS else None
+        if stats is not None and self.background_solver is None:
+            stats_line = (f"nodes {stats.nodes:,} | backtracks {stats.backtracks:,} | pruned {stats.pruned:,}"
+                          f" | max depth {stats.max_depth} | {stats.nodes_per_sec:,.0f} nodes/s")
+            if stats.tt_lookups:
+                stats_line += f" | tt hits {stats.tt_hit_rate:.0%}"
+            dirty.append(self.screen.blit(self.text_cache.render(self.font, stats_line, (150, 150, 150)), (20, 50)))
         
         # Bottom Left Info
-        info_txt = self.font.render("ESC: Exit | R: Regenerate", True, (150, 150, 150))
-        self.screen.blit(info_txt, (20, self.height - 40))
+        level_txt = f"Level {self.level_id or '...'}"
+        if self.level_difficulty is not None:
+            level_txt += f" ({band_of(self.level_difficulty)})"
+        info_txt = self.text_cache.render(self.font, f"ESC: Exit | R: Regenerate | {level_txt}", (150, 150, 150))
+        dirty.append(self.screen.blit(info_txt, (20, self.height - 40)))
         
         # Draw Tooltip if dragging or hovering
         active_piece = self.dragging_piece if self.dragging_piece else self.hovered_piece
@@ -833,19 +1060,27 @@ class HexGame:
             msg = "Rotations: Arrow UP/DOWN (Horizontal Axis) | Arrow LEFT/RIGHT (Vertical Axis)"
             
             # Setup tooltip box
-            text_surf = self.font.render(msg, True, (0, 0, 0)) # Black text
+            text_surf = self.text_cache.render(self.font, msg, (0, 0, 0)) # Black text
             bg_rect = text_surf.get_rect(center=(self.width/2, 30))
             bg_rect.inflate_ip(20, 10)
             
-            pygame.draw.rect(self.screen, (255, 255, 0), bg_rect, border_radius=5)
+            dirty.append(pygame.draw.rect(self.screen, (255, 255, 0), bg_rect, border_radius=5))
             self.screen.blit(text_surf, text_surf.get_rect(center=bg_rect.center))
 
         # Draw completion animation overlay (on top of everything)
         self.update_completion_animation()
         self.draw_completion_animation()
 
-        pygame.display.flip()
-
+        screen_rect = self.screen.get_rect()
+        dirty = [rect.clip(screen_rect) for rect in dirty]
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            # Regions changed this frame: last frame's elements (erased) and this frame's
+            pygame.display.update(self.dirty_rects + dirty)
+        # Once the animation is over, one more full frame wipes its last particles
+        self.full_redraw = self.completion_animation_active
+        self.dirty_rects = dirty
 
     def handle_input(self):
         for event in pygame.event.get():
@@ -883,6 +1118,8 @@ class HexGame:
             # Mouse Interaction
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 mx, my = event.pos
+                if self.generator is not None:
+                    continue # No level to solve or reset yet
                 
                 # 1. Check Button
                 if self.solve_button_rect.collidepoint(mx, my):
@@ -890,8 +1127,9 @@ class HexGame:
                     continue
                 
                 if self.reset_button_rect.collidepoint(mx, my):
+                    # Stop solving if running
+                    self.stop_background_solver()
                     self.reset_grid()
-                    # Also stop solving if running
                     self.solving = False
                     continue
                 
@@ -906,6 +1144,9 @@ class HexGame:
                              # Remove from grid
                              if 'grid_pos' in piece:
                                  self.place_piece(piece, *piece['grid_pos'], remove=True)
+                                 # Drag it from where it is drawn: the box of its anchor cell
+                                 r, c = piece['grid_pos']
+                                 piece['screen_pos'] = (self.offset_x + c * self.tri_w / 2, self.offset_y + r * self.tri_h)
                          
                          # Calculate drag offset
                          px, py = piece['screen_pos']
@@ -940,8 +1181,11 @@ class HexGame:
                                 self.start_completion_animation()
                     
                     if not placed:
-                        # Return to inventory (reset pos)
-                        self.dragging_piece['screen_pos'] = self.dragging_piece['reset_pos']
+                        # Return to inventory (reset pos), in a slot matching its current orientation
+                        piece = self.dragging_piece
+                        self.dragging_piece = None
+                        self.layout_inventory()
+                        piece['screen_pos'] = piece['reset_pos']
                     
                     self.dragging_piece = None
             
@@ -1047,13 +1291,38 @@ class HexGame:
 
     def get_piece_under_mouse(self, mx, my):
         """
-        Finds a piece under the mouse cursor.
+        Finds a piece under the mouse cursor, at pixel precision.
         Prioritizes pieces in inventory, then grid.
+
+        Inventory pieces are looked up in the spatial index (only the few pieces
+        whose bounding box overlaps the grid cell of the cursor are tested) and
+        tested against the mask of their sprite, so the empty corners of concave
+        pieces do not catch clicks. Placed pieces are found through the board cell
+        under the cursor.
+
+        Args:
+            mx (int): Screen x coordinate.
+            my (int): Screen y coordinate.
+
+        Returns:
+            dict: The piece, or None.
         """
-        # Iterate all pieces
-        for p in self.pieces:
-            if p['rect'] and p['rect'].collidepoint(mx, my):
-                return p
+        for piece in self.piece_index.query(mx, my):
+            if piece['placed'] or piece is self.dragging_piece:
+                continue # Stale entry, the index is refreshed on the next frame
+            _, mask, (dx, dy) = self.piece_sprite(piece)
+            px, py = piece['screen_pos']
+            # Same rounding as draw_piece, so the mask lines up with the drawn sprite
+            x, y = mx - round(px + dx), my - round(py + dy)
+            w, h = mask.get_size()
+            if 0 <= x < w and 0 <= y < h and mask.get_at((x, y)):
+                return piece
+
+        cell = self.geometry.cell_at(mx, my)
+        if cell is not None:
+            pid = self.grid[cell]
+            if pid is not None:
+                return self.pieces[pid]
         return None
 
     def run(self):
@@ -1070,24 +1339,17 @@ class HexGame:
             running = self.handle_input()
             now = pygame.time.get_ticks()
             
+            if self.generator is not None:
+                self.poll_generator()
             if self.solving and not self.solved:
-                # Run solver step if enough time has passed
-                if now - last_step > TARGET_DELAY:
-                    try:
-                        res = next(self.solver_iter)
-                        if res is True:
-                            self.solved = True
-                            self.solution_time = time.time() - self.start_time
-                            self.solving = False
-                            self.start_completion_animation()
-                        elif self.is_solved(): # Check double catch
-                            self.solved = True
-                            self.solution_time = time.time() - self.start_time
-                            self.solving = False
-                            self.start_completion_animation()
-                    except StopIteration:
-                        # Backtracking finished without solution (should not happen here)
-                        self.solving = False
+                if self.background_solver is not None:
+                    self.poll_background_solver()
+                elif SOLVE_MODE == "batch" and not self.replaying:
+                    # Run as many solver steps as fit in the frame budget
+                    self.advance_solver(SOLVE_FRAME_BUDGET)
+                elif now - last_step > TARGET_DELAY:
+                    # Run solver (or replay) step if enough time has passed
+                    self.advance_solver()
                     last_step = now
             
             # Update position of dragging piece to follow mouse
@@ -1103,5 +1365,23 @@ class HexGame:
         sys.exit()
 
 if __name__ == "__main__":
-    game = HexGame()
+    parser = argparse.ArgumentParser(description="HEXED: One Piece Left")
+    parser.add_argument("--level", help="level ID to play, as shown in the bottom left corner (e.g. 4-1f3a9c07)")
+    parser.add_argument("--difficulty", choices=list(DIFFICULTY_BANDS), default=LEVEL_DIFFICULTY,
+                        help="only generate levels of this difficulty")
+    parser.add_argument("--unique", action="store_true", default=LEVEL_UNIQUE,
+                        help="only generate levels with a single solution")
+    parser.add_argument("--pack", default=LEVEL_PACK, help="play random levels from this level pack (see levelpack.py)")
+    args = parser.parse_args()
+    if args.level:
+        try:
+            parse_level_id(args.level)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.pack:
+        try:
+            LevelPack(args.pack).close()
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    game = HexGame(args.level, args.difficulty, args.unique, args.pack)
     game.run()
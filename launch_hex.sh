@@ -40,7 +40,7 @@ fi
 # 4. Run application
 if [ -f "$APP_SCRIPT" ]; then
     echo "[*] Starting Application..."
-    python3 "$APP_SCRIPT"
+    python3 "$APP_SCRIPT" "$@"
 else
     handle_error "Application script $APP_SCRIPT not found."
 fi
@@ -0,0 +1,295 @@
+"""
+Pre-generated level packs.
+
+A level pack is a binary file holding many levels of one board side, produced
+offline (generation, scoring and validation are too slow to do at startup once
+levels are filtered by difficulty or uniqueness) and memory-mapped by the game.
+
+File layout (little-endian):
+
+    header   magic b"HXPK", version (u16), side (u16), level count (u32),
+             bytes per piece mask (u16), reserved (u16)
+    index    level count x u64: file offset of every level record
+    records  one per level:
+                 seed (u32), flags (u8, bit 0: unique), difficulty (f64, NaN if
+                 unknown), piece count (u16), then per piece:
+                 cell mask (mask bytes), color (3 x u8)
+
+Piece masks use the bit order of HexBoard.cells and are stored at the position
+of the piece in the canonical solution of the level: the partition it was
+generated from. The masks alone therefore give the shapes, the anchor parities
+and a solution, so loading a level needs neither the generator nor the solver.
+
+Thanks to the index, any level is read in O(1) without parsing the rest of the
+file.
+
+Usage:
+    python levelpack.py build --side 4 --count 500 --band hard --unique --output hard4.hxp
+    python levelpack.py info hard4.hxp
+"""
+import argparse
+import math
+import mmap
+import random
+import struct
+import sys
+
+from difficulty import DIFFICULTY_BANDS, band_of, generate_levels_for_difficulty
+from solver import HexBoard, build_pieces, generate_level, make_level_id, parse_level_id
+
+PACK_MAGIC = b"HXPK"
+PACK_VERSION = 2 # 2: difficulty stored as f64 (an f32 score near a band edge could change band)
+_HEADER = struct.Struct("<4sHHIHH")
+_OFFSET = struct.Struct("<Q")
+_RECORD = struct.Struct("<IBdH")
+_COLOR = struct.Struct("<3B")
+_FLAG_UNIQUE = 1
+
+
+class PackedLevel:
+    """
+    A level read from a pack.
+
+    Attributes:
+        level_id (str): ID of the level (regenerates the same pieces with generate_level).
+        side (int): Side of the board.
+        difficulty (float): Difficulty score (see difficulty.LevelScore), or None.
+        pieces (list): Piece objects, as built by build_pieces.
+        solution (list): (piece id, (row, col) anchor) placements of the canonical solution.
+    """
+    def __init__(self, level_id, side, difficulty, pieces, solution):
+        self.level_id = level_id
+        self.side = side
+        self.difficulty = difficulty
+        self.pieces = pieces
+        self.solution = solution
+
+
+def write_pack(path, side, levels):
+    """
+    Write a level pack.
+
+    Args:
+        path (str): Output file.
+        side (int): Board side of every level.
+        levels (list): (level_id, pieces, difficulty) tuples. The pieces must be
+            the generated ones (they carry their 'solution_pos'), the difficulty
+            may be None.
+
+    Returns:
+        int: Number of levels written.
+    """
+    board = HexBoard(side)
+    mask_bytes = (len(board.cells) + 7) // 8
+
+    records = []
+    for level_id, pieces, difficulty in levels:
+        level_side, seed, unique = parse_level_id(level_id)
+        if level_side != side:
+            raise ValueError(f"Level {level_id} does not have side {side}")
+        record = bytearray(_RECORD.pack(
+            seed, _FLAG_UNIQUE if unique else 0, math.nan if difficulty is None else difficulty, len(pieces)
+        ))
+        for mask, piece in zip(_solution_masks(board, pieces), pieces):
+            record += mask.to_bytes(mask_bytes, 'little')
+            record += _COLOR.pack(*piece['color'])
+        records.append(record)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, side, len(records), mask_bytes, 0))
+        offset = _HEADER.size + _OFFSET.size * len(records)
+        for record in records:
+            f.write(_OFFSET.pack(offset))
+            offset += len(record)
+        for record in records:
+            f.write(record)
+    return len(records)
+
+
+def _solution_masks(board, pieces):
+    """
+    Get the cell masks of the pieces at their position in the partition they
+    were generated from (see build_pieces, 'solution_pos').
+
+    Args:
+        board (HexBoard): Empty board of the level side.
+        pieces (list): The generated piece objects.
+
+    Returns:
+        list: One bitmask per piece.
+    """
+    masks = []
+    for piece in pieces:
+        ref_row, ref_col = piece['solution_pos']
+        masks.append(board.cell_mask((ref_row + dr, ref_col + dc) for dr, dc in piece['shape']))
+    return masks
+
+
+class LevelPack:
+    """
+    Read-only, memory-mapped level pack.
+
+    Only the header is parsed when the pack is opened; levels are decoded on
+    demand from the mapped file, so opening a pack of any size is instantaneous
+    and only the pages of the levels actually played are read from disk.
+
+    Attributes:
+        path (str): The pack file.
+        side (int): Board side of every level.
+    """
+    def __init__(self, path):
+        """
+        Open a pack.
+
+        Args:
+            path (str): The pack file.
+
+        Raises:
+            ValueError: If the file is not a level pack of a supported version.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: # Empty file
+                raise ValueError(f"{path} is not a level pack") from None
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a level pack")
+        magic, version, self.side, self._count, self._mask_bytes, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {PACK_VERSION} level pack")
+        # The board is only used to convert masks back to cells
+        self._board = HexBoard(self.side)
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmap the file. Levels already read stay valid.
+        """
+        self._map.close()
+
+    def level(self, index):
+        """
+        Decode one level.
+
+        Args:
+            index (int): Level index, in [0, len(pack)).
+
+        Returns:
+            PackedLevel: The level, with fresh (unplaced) piece objects.
+        """
+        if not 0 <= index < self._count:
+            raise IndexError(f"Level index {index} out of range (pack has {self._count} levels)")
+        (offset,) = _OFFSET.unpack_from(self._map, _HEADER.size + _OFFSET.size * index)
+        seed, flags, difficulty, piece_count = _RECORD.unpack_from(self._map, offset)
+        offset += _RECORD.size
+
+        piece_cells = []
+        colors = []
+        for _ in range(piece_count):
+            mask = int.from_bytes(self._map[offset:offset + self._mask_bytes], 'little')
+            offset += self._mask_bytes
+            piece_cells.append([i for i in range(mask.bit_length()) if mask >> i & 1])
+            colors.append(_COLOR.unpack_from(self._map, offset))
+            offset += _COLOR.size
+
+        # The masks are the canonical solution, so every piece gets its solution_pos back
+        pieces = build_pieces(self._board, piece_cells, colors)
+        solution = [(piece['id'], piece['solution_pos']) for piece in pieces]
+        level_id = make_level_id(self.side, seed, bool(flags & _FLAG_UNIQUE))
+        return PackedLevel(level_id, self.side, None if math.isnan(difficulty) else difficulty, pieces, solution)
+
+    def random_level(self, rng=None):
+        """
+        Decode a random level.
+
+        Args:
+            rng (random.Random, optional): Random generator. Defaults to the random module.
+
+        Returns:
+            PackedLevel: The level.
+        """
+        if not self._count:
+            raise IndexError("Empty level pack")
+        return self.level((rng or random).randrange(self._count))
+
+
+def build_pack(path, side, count, band=None, unique=False, seed=None, max_candidates=None, processes=None):
+    """
+    Generate, score and write a level pack.
+
+    Args:
+        path (str): Output file.
+        side (int): Side of the board.
+        count (int): Number of levels wanted.
+        band (str, optional): A key of DIFFICULTY_BANDS. Any scored level if None.
+        unique (bool): Only keep levels with a single solution.
+        seed (int, optional): Seed of the candidate sequence. Random if None.
+        max_candidates (int, optional): Number of candidates scored before giving up.
+            Defaults to 20 per requested level.
+        processes (int, optional): Pool size. Defaults to the number of CPUs.
+
+    Returns:
+        int: Number of levels written (less than count if candidates ran out).
+    """
+    if max_candidates is None:
+        max_candidates = 20 * count
+    board = HexBoard(side)
+    levels = []
+    for score in generate_levels_for_difficulty(side, band, count, seed, max_candidates, processes, unique):
+        # Regenerating from the ID is cheap and gives back the partition positions
+        board, pieces = generate_level(score.level_id, board)
+        levels.append((score.level_id, pieces, score.difficulty))
+    return write_pack(path, side, levels)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and inspect HEXED level packs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="generate a level pack")
+    build.add_argument("--side", type=int, default=3, help="board side (default: 3)")
+    build.add_argument("--count", type=int, default=100, help="number of levels (default: 100)")
+    build.add_argument("--band", choices=list(DIFFICULTY_BANDS), help="difficulty band (default: any)")
+    build.add_argument("--unique", action="store_true", help="only levels with a single solution")
+    build.add_argument("--seed", type=int, help="seed of the candidate sequence (default: random)")
+    build.add_argument("--max-candidates", type=int, help="candidates scored before giving up (default: 20 per level)")
+    build.add_argument("--processes", type=int, help="worker processes (default: number of CPUs)")
+    build.add_argument("--output", required=True, help="pack file to write")
+
+    info = commands.add_parser("info", help="describe a level pack")
+    info.add_argument("pack", help="pack file to read")
+    info.add_argument("--levels", type=int, default=10, help="number of levels listed (default: 10)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        written = build_pack(args.output, args.side, args.count, args.band, args.unique, args.seed,
+                             args.max_candidates, args.processes)
+        print(f"Wrote {written} level(s) to {args.output}")
+        if written < args.count:
+            print(f"Only {written} of {args.count} level(s) found", file=sys.stderr)
+            return 1
+        return 0
+
+    with LevelPack(args.pack) as pack:
+        print(f"{args.pack}: {len(pack)} level(s), side {pack.side}")
+        for index in range(min(args.levels, len(pack))):
+            level = pack.level(index)
+            difficulty = "?" if level.difficulty is None else f"{level.difficulty:.2f}"
+            print(f"  {index:>5}  {level.level_id}  difficulty {difficulty}"
+                  f" ({band_of(level.difficulty) or 'unscored'}) | {len(level.pieces)} pieces")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Rectangle packing for the piece inventory.
+
+The inventory used to be laid out in shelves (left to right, a new row when
+the next piece does not fit), and the scale was found by shrinking it in steps
+and laying everything out again until the pieces fit. Here the pieces are
+packed with a skyline packer, which fills the gaps a shelf leaves under its
+short pieces, and the largest fitting scale is found by a binary search over
+the packing alone, which only needs the piece sizes.
+"""
+
+
+def skyline_pack(sizes, width, height, padding=0, obstacles=()):
+    """
+    Pack rectangles into an area with a bottom-left skyline packer.
+
+    The packed region is kept as a skyline: the list of the lowest free y of
+    every horizontal segment of the area (y grows downwards, so "bottom" is the
+    top of the screen). Every rectangle goes to the position where its top is
+    the highest, leftmost on ties. Rectangles are placed tallest first, which
+    keeps the skyline flat; if they do not fit that way, they are placed again
+    in the given order.
+
+    Args:
+        sizes (list): (width, height) of every rectangle.
+        width (float): Width of the area.
+        height (float): Height of the area (math.inf for an unbounded area).
+        padding (float): Space kept between rectangles (not along the borders of the area).
+        obstacles (list): (x, y, width, height) regions of the area that rectangles
+            must stay clear of (by padding too), e.g. buttons drawn over it.
+
+    Returns:
+        list: (x, y) of the top-left corner of every rectangle, in the order of
+            sizes, or None if they do not all fit.
+    """
+    # Padding is added to every rectangle and to the area, so it only ends up between rectangles
+    padded = [(w + padding, h + padding) for w, h in sizes]
+    obstacles = [(x, y, w + padding, h + padding) for x, y, w, h in obstacles]
+    width += padding
+    height += padding
+    if sum(w * h for w, h in padded) > width * height:
+        return None # Not even the total area fits
+    tallest_first = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = _pack_in_order(padded, tallest_first, width, height, obstacles)
+    if positions is None:
+        positions = _pack_in_order(padded, range(len(sizes)), width, height, obstacles)
+    return positions
+
+
+def _pack_in_order(sizes, order, width, height, obstacles):
+    """
+    Place padded rectangles in the given order (see skyline_pack).
+    """
+    skyline = [[0.0, 0.0, width]] # Segments [x, y, w], left to right, covering the area
+    positions = [None] * len(sizes)
+    for i in order:
+        w, h = sizes[i]
+        best = None # (y, x, index of the first segment under the rectangle)
+        for start, (x, _, _) in enumerate(skyline):
+            if x + w > width:
+                break
+            # The rectangle rests on the highest segment it spans
+            y = 0.0
+            end = start
+            while end < len(skyline) and skyline[end][0] < x + w:
+                y = max(y, skyline[end][1])
+                end += 1
+            if y + h > height or best is not None and (y, x) >= best[:2]:
+                continue
+            if any(ox < x + w and x < ox + ow and oy < y + h and y < oy + oh for ox, oy, ow, oh in obstacles):
+                continue
+            best = (y, x, start)
+        if best is None:
+            return None
+        y, x, start = best
+        positions[i] = (x, y)
+        _raise_skyline(skyline, start, x + w, y + h)
+    return positions
+
+
+def _raise_skyline(skyline, start, right, top):
+    """
+    Raise the skyline to `top` from the left of segment `start` to `right`,
+    splitting the last segment covered and merging equal neighbors.
+    """
+    x = skyline[start][0]
+    end = start
+    while end < len(skyline) and skyline[end][0] < right:
+        end += 1
+    # Segment end - 1 may stick out on the right of the rectangle
+    last_x, last_y, last_w = skyline[end - 1]
+    new = [[x, top, right - x]]
+    if last_x + last_w > right:
+        new.append([right, last_y, last_x + last_w - right])
+    skyline[start:end] = new
+
+    # Merge with the neighbors at the same height
+    i = max(start - 1, 0)
+    while i < min(start + 2, len(skyline) - 1):
+        if skyline[i][1] == skyline[i + 1][1]:
+            skyline[i][2] += skyline[i + 1][2]
+            del skyline[i + 1]
+        else:
+            i += 1
+
+
+def largest_fitting_scale(sizes, width, height, padding=0, min_scale=0.0, max_scale=1.0, precision=0.005,
+                          obstacles=()):
+    """
+    Find the largest scale at which rectangles still fit in an area.
+
+    Rectangle sizes are proportional to the scale, the area and the padding are
+    not. The fit is checked with skyline_pack at each step of a binary search.
+
+    Args:
+        sizes (list): (width, height) of every rectangle at scale 1.
+        width (float): Width of the area.
+        height (float): Height of the area.
+        padding (float): Space kept between rectangles.
+        min_scale (float): Smallest scale tried.
+        max_scale (float): Largest scale tried.
+        precision (float): The search stops once the interval is smaller than this.
+        obstacles (list): Regions to keep clear (see skyline_pack).
+
+    Returns:
+        tuple: (scale, positions) with the largest fitting scale in [min_scale,
+            max_scale] and the skyline_pack positions of the rectangles at that
+            scale, or None if they do not fit even at min_scale.
+    """
+    def pack(scale):
+        scaled = [(w * scale, h * scale) for w, h in sizes]
+        return skyline_pack(scaled, width, height, padding, obstacles)
+
+    positions = pack(max_scale)
+    if not sizes or positions is not None:
+        return max_scale, positions
+    positions = pack(min_scale)
+    if positions is None:
+        return None
+    # Nothing fits beyond the scale where the widest rectangle fills the width,
+    # the tallest the height, or all of them the whole area
+    high = min(
+        max_scale,
+        width / max(w for w, h in sizes),
+        height / max(h for w, h in sizes),
+        (width * height / sum(w * h for w, h in sizes)) ** 0.5,
+    )
+    low = min_scale # pack(low) fits, nothing fits above high
+    while high - low > precision:
+        middle = (low + high) / 2
+        packed = pack(middle)
+        if packed is not None:
+            low, positions = middle, packed
+        else:
+            high = middle
+    # The positions come from the search itself: packing again at a scale computed
+    # another way could round differently, break a tie otherwise and not fit
+    return low, positions
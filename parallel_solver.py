@@ -0,0 +1,187 @@
+"""
+Multi-process solver for large boards.
+
+The search tree is split at its first levels and every subtree is solved by a
+worker of a process pool. The split follows the branching of the strategy used
+in the workers (the choice of piece for the first empty cell with backtracking,
+the column with the fewest rows with DLX, see the solvers' branches method), so
+the subtrees are the ones a serial search goes through, in the same order. As
+soon as one worker finds a solution a shared event is set: running workers
+abort their search and queued subtrees are skipped. With a single subtree or a
+single process there is nothing to share and the search runs serially.
+
+Usage:
+    python parallel_solver.py 5-00000003 --strategy dlx --processes 4
+
+compares a parallel solve of a level with a serial one (nodes and wall time).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from solver import SOLVER_STRATEGIES, HexBoard, SolverCancelled, copy_pieces, generate_level, make_solver
+
+# Per-process state, set by _init_worker
+_cancel_event = None
+_boards = {}
+
+
+class ParallelSolveResult:
+    """
+    Outcome of a parallel solve.
+
+    Attributes:
+        solved (bool): True if a solution was found.
+        solution (list): (piece index, orientation index, anchor) placements of the
+            solution, including the split prefix. Empty if not solved.
+        worker_nodes (dict): Process id -> number of nodes explored by that worker.
+        tasks (int): Number of subtrees the search was split into (1 when it ran serially).
+        elapsed (float): Wall time of the solve, in seconds.
+    """
+    def __init__(self):
+        self.solved = False
+        self.solution = []
+        self.worker_nodes = {}
+        self.tasks = 0
+        self.elapsed = 0.0
+
+    @property
+    def nodes(self):
+        """
+        Total number of nodes explored by all the workers.
+        """
+        return sum(self.worker_nodes.values())
+
+
+def solve_parallel(board, pieces, strategy='backtrack', prune=True, all_orientations=False,
+                   split_depth=2, processes=None):
+    """
+    Solve a board with a pool of worker processes.
+
+    On success the board and the pieces are left in the solved state, exactly
+    like solver.solve().
+
+    Args:
+        board (HexBoard): The board to fill. Already covered cells are kept.
+        pieces (list): The piece objects available to the solver.
+        strategy (str): Solver strategy used inside each subtree (a key of SOLVER_STRATEGIES).
+        prune (bool): Enable dead-region pruning, both for the split and in the workers.
+        all_orientations (bool): Let the solver rotate and reflect the pieces.
+        split_depth (int): Number of branching levels expanded before fanning out.
+        processes (int, optional): Pool size. Defaults to the number of CPUs.
+
+    Returns:
+        ParallelSolveResult: Solution and per-worker node counts.
+    """
+    start = time.perf_counter()
+    result = ParallelSolveResult()
+
+    splitter = make_solver(board, pieces, strategy, animate=False, prune=prune, all_orientations=all_orientations)
+    prefixes = splitter.branches(split_depth)
+    processes = processes or os.cpu_count() or 1
+    if len(prefixes) < 2 or processes < 2:
+        # Nothing to share: a pool would only add its startup and the split overhead
+        result.tasks = 1
+        result.solved = splitter.solve()
+        result.solution = list(splitter.solution)
+        result.worker_nodes[os.getpid()] = splitter.stats.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+    result.tasks = len(prefixes)
+
+    # Only plain data is sent to the workers (GUI pieces also carry pygame objects)
+    piece_data = copy_pieces(pieces)
+    tasks = [
+        (board.side, piece_data, prefix, strategy, prune, all_orientations)
+        for prefix in prefixes
+    ]
+
+    cancel_event = multiprocessing.Event()
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(cancel_event,)) as pool:
+        for found, solution, nodes, pid in pool.imap_unordered(_solve_branch, tasks):
+            result.worker_nodes[pid] = result.worker_nodes.get(pid, 0) + nodes
+            if found and not result.solved:
+                result.solved = True
+                result.solution = solution
+                cancel_event.set()
+
+    if result.solved:
+        # Replay the solution with the same orientation tables as the workers
+        for i, k, anchor in result.solution:
+            splitter.place(i, k, anchor)
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _init_worker(cancel_event):
+    global _cancel_event
+    _cancel_event = cancel_event
+
+
+def _solve_branch(task):
+    """
+    Worker entry point: solve the subtree below one split prefix.
+
+    Returns:
+        tuple: (found, full solution, nodes explored, process id)
+    """
+    side, pieces, prefix, strategy, prune, all_orientations = task
+    pid = os.getpid()
+    if _cancel_event is not None and _cancel_event.is_set():
+        return False, [], 0, pid
+
+    # Boards (and their placement caches) are reused across tasks of the same process
+    board = _boards.get(side)
+    if board is None:
+        board = _boards[side] = HexBoard(side)
+    board.reset()
+    for piece in pieces:
+        if piece['placed']:
+            board.place_piece(piece, *piece['grid_pos'])
+
+    solver = make_solver(board, pieces, strategy, animate=False, prune=prune, all_orientations=all_orientations)
+    for i, k, anchor in prefix:
+        solver.place(i, k, anchor)
+    solver.cancel_event = _cancel_event
+    try:
+        found = solver.solve()
+    except SolverCancelled:
+        found = False
+    return found, list(prefix) + solver.solution if found else [], solver.stats.nodes, pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a parallel solve of a HEXED level with a serial one.")
+    parser.add_argument("level", help="level ID, e.g. 5-00000003")
+    parser.add_argument("--strategy", choices=sorted(SOLVER_STRATEGIES), default='dlx', help="solver strategy (default: dlx)")
+    parser.add_argument("--processes", type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--split-depth", type=int, default=2, help="branching levels expanded (default: 2)")
+    parser.add_argument("--no-prune", action="store_true", help="disable dead-region pruning")
+    args = parser.parse_args(argv)
+    prune = not args.no_prune
+
+    board, pieces = generate_level(args.level)
+    solver = make_solver(board, pieces, args.strategy, animate=False, prune=prune)
+    start = time.perf_counter()
+    solved = solver.solve()
+    serial_time = time.perf_counter() - start
+    serial_nodes = solver.stats.nodes
+    print(f"serial    {serial_nodes:>12,} nodes  {serial_time:8.2f} s  solved={solved}")
+
+    board, pieces = generate_level(args.level)
+    result = solve_parallel(board, pieces, args.strategy, prune, split_depth=args.split_depth,
+                            processes=args.processes)
+    print(f"parallel  {result.nodes:>12,} nodes  {result.elapsed:8.2f} s  solved={result.solved}"
+          f"  ({result.tasks} subtree(s), {len(result.worker_nodes)} worker(s))")
+    print(f"          {result.nodes / max(serial_nodes, 1):.2f}x the serial nodes,"
+          f" {serial_time / result.elapsed if result.elapsed else 0:.2f}x speedup")
+    for pid, nodes in sorted(result.worker_nodes.items()):
+        print(f"  worker {pid}: {nodes:,} nodes")
+    return 0 if result.solved == solved else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
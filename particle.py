@@ -1,40 +1,209 @@
-import pygame
+"""
+Particle system for the completion explosion.
+
+All the particles live in preallocated arrays (one per attribute) and are
+updated in one batched step per frame: with NumPy the update is a handful of
+vectorized operations, without it a single loop over flat `array` buffers.
+Dead particles are compacted away in place, so no objects are created or
+destroyed while the animation runs.
+
+Particles are drawn by blitting pre-rendered alpha sprites, cached by color,
+radius and (quantized) opacity, in a single `Surface.blits` call.
+"""
 import random
+from array import array
+
+import pygame
+
+try:
+    import numpy
+except ImportError: # Optional dependency
+    numpy = None
+
+PARTICLE_CAPACITY = 4096 # Particles beyond this number are not emitted
+GRAVITY = 0.3 # Added to the vertical speed every frame
+SHRINK = 0.1 # Radius lost every frame (down to 1 pixel)
+ALPHA_STEP = 17 # Opacity quantization of the sprite cache (16 levels)
+
+# Attribute rows of the particle arrays
+_X, _Y, _VX, _VY, _LIFE, _DECAY, _SIZE, _COLOR = range(8)
+_FIELDS = 8
 
 
-class Particle:
+class ParticleSystem:
     """
-    A simple particle for explosion effects.
+    A pool of particles, stored as arrays.
+
+    Every particle has a position, a velocity, a life (1.0 = full, 0.0 = dead)
+    that decays at its own rate, a size that shrinks, and a color. The first
+    `len(system)` slots of the arrays hold the living particles.
     """
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.vx = random.uniform(-8, 8)
-        self.vy = random.uniform(-12, -2)
-        self.gravity = 0.3
-        self.life = 1.0  # 1.0 = full, 0.0 = dead
-        self.decay = random.uniform(0.01, 0.03)
-        self.size = random.randint(4, 12)
-    
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        """
+        Allocate the pool.
+
+        Args:
+            capacity (int): Maximum number of living particles.
+        """
+        self.capacity = capacity
+        self.count = 0
+        self.palette = [] # Color index -> RGB
+        self._color_index = {}
+        self._sprites = {} # Sprite key (see _sprite_key) -> Surface
+        if numpy is not None:
+            self._data = numpy.zeros((_FIELDS, capacity))
+        else:
+            self._data = [array('d', bytes(8 * capacity)) for _ in range(_FIELDS)]
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        """
+        Kill every particle. The sprite cache is kept.
+        """
+        self.count = 0
+
+    def emit(self, x, y, color):
+        """
+        Emit one particle with a random velocity, decay and size.
+
+        Args:
+            x (float): Start x.
+            y (float): Start y.
+            color (tuple): RGB color.
+
+        Returns:
+            bool: False if the pool is full (the particle is dropped).
+        """
+        if self.count >= self.capacity:
+            return False
+        color_index = self._color_index.get(color)
+        if color_index is None:
+            color_index = self._color_index[color] = len(self.palette)
+            self.palette.append(color)
+        i = self.count
+        data = self._data
+        data[_X][i] = x
+        data[_Y][i] = y
+        data[_VX][i] = random.uniform(-8, 8)
+        data[_VY][i] = random.uniform(-12, -2)
+        data[_LIFE][i] = 1.0
+        data[_DECAY][i] = random.uniform(0.01, 0.03)
+        data[_SIZE][i] = random.randint(4, 12)
+        data[_COLOR][i] = color_index
+        self.count += 1
+        return True
+
+    def emit_burst(self, x, y, width, height, color, count):
+        """
+        Emit particles at random positions inside a rectangle.
+
+        Args:
+            x (float): Left of the rectangle.
+            y (float): Top of the rectangle.
+            width (float): Width of the rectangle.
+            height (float): Height of the rectangle.
+            color (tuple): RGB color.
+            count (int): Number of particles.
+        """
+        for _ in range(count):
+            if not self.emit(x + random.uniform(0, width), y + random.uniform(0, height), color):
+                break
+
     def update(self):
-        """Update particle position and life."""
-        self.x += self.vx
-        self.y += self.vy
-        self.vy += self.gravity
-        self.life -= self.decay
-        self.size = max(1, self.size - 0.1)
-    
-    def draw(self, screen):
-        """Draw the particle with fading alpha."""
-        if self.life <= 0:
+        """
+        Advance every particle by one frame and drop the dead ones.
+        """
+        n = self.count
+        if not n:
+            return
+        data = self._data
+        if numpy is not None:
+            live = data[:, :n]
+            live[_X] += live[_VX]
+            live[_Y] += live[_VY]
+            live[_VY] += GRAVITY
+            live[_LIFE] -= live[_DECAY]
+            numpy.maximum(live[_SIZE] - SHRINK, 1, out=live[_SIZE])
+            alive = live[_LIFE] > 0
+            self.count = int(alive.sum())
+            if self.count < n:
+                data[:, :self.count] = live[:, alive]
+            return
+
+        x, y, vx, vy, life, decay, size, _ = data
+        i = 0
+        while i < n:
+            life[i] -= decay[i]
+            if life[i] <= 0:
+                # Dead: move the last living particle into this slot
+                n -= 1
+                for field in data:
+                    field[i] = field[n]
+                continue
+            x[i] += vx[i]
+            y[i] += vy[i]
+            vy[i] += GRAVITY
+            size[i] = max(1.0, size[i] - SHRINK)
+            i += 1
+        self.count = n
+
+    def draw(self, surface):
+        """
+        Draw every particle with its fading alpha.
+
+        Args:
+            surface (pygame.Surface): Target surface.
+        """
+        n = self.count
+        if not n:
             return
-        alpha = int(255 * self.life)
-        # Create a surface for alpha blending
-        surf = pygame.Surface((int(self.size * 2), int(self.size * 2)), pygame.SRCALPHA)
-        color_with_alpha = (*self.color, alpha)
-        pygame.draw.circle(surf, color_with_alpha, (int(self.size), int(self.size)), int(self.size))
-        screen.blit(surf, (int(self.x - self.size), int(self.y - self.size)))
-    
-    def is_alive(self):
-        return self.life > 0
+        data = self._data
+        if numpy is not None:
+            live = data[:, :n]
+            size = live[_SIZE]
+            levels = ((255 * live[_LIFE]).astype(int) + ALPHA_STEP // 2) // ALPHA_STEP
+            keys = _sprite_key(live[_COLOR].astype(int), size.astype(int), (size * 2).astype(int), levels)
+            visible = levels > 0
+            items = zip(
+                keys[visible].tolist(),
+                (live[_X] - size).astype(int)[visible].tolist(),
+                (live[_Y] - size).astype(int)[visible].tolist(),
+            )
+        else:
+            items = []
+            for x, y, size, life, color in zip(
+                data[_X][:n], data[_Y][:n], data[_SIZE][:n], data[_LIFE][:n], data[_COLOR][:n]
+            ):
+                level = (int(255 * life) + ALPHA_STEP // 2) // ALPHA_STEP
+                if level > 0:
+                    key = _sprite_key(int(color), int(size), int(size * 2), level)
+                    items.append((key, int(x - size), int(y - size)))
+
+        sprites = self._sprites
+        blits = []
+        for key, x, y in items:
+            sprite = sprites.get(key)
+            if sprite is None:
+                sprite = sprites[key] = self._render_sprite(key)
+            blits.append((sprite, (x, y)))
+        surface.blits(blits, doreturn=False)
+
+    def _render_sprite(self, key):
+        """
+        Pre-render one alpha sprite: a disc on a transparent square.
+        """
+        color_index, radius, size, level = key >> 17, key >> 11 & 63, key >> 5 & 63, key & 31
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        alpha = min(255, level * ALPHA_STEP)
+        pygame.draw.circle(sprite, (*self.palette[color_index], alpha), (radius, radius), radius)
+        return sprite
+
+
+def _sprite_key(color_index, radius, size, level):
+    """
+    Pack the sprite parameters into one integer (works on NumPy arrays too):
+    color index, radius (6 bits), surface size (6 bits), alpha level (5 bits).
+    """
+    return color_index << 17 | radius << 11 | size << 5 | level
@@ -0,0 +1,1919 @@
+"""
+Headless solver engine for the Hexed tiling puzzle.
+
+This module holds the logical side of the game (the hexagonal board, the
+piece placement rules and the backtracking solver) without any dependency on
+pygame, so it can be imported quickly and used from batch jobs or servers
+that have no display.
+
+Pieces are plain dictionaries, the same objects used by the GUI. The solver
+only relies on the following keys:
+    'id'    (int): Unique piece identifier, stored in the grid cells.
+    'shape' (list): Relative (dr, dc) coordinates of the piece triangles.
+    'placed' (bool): Whether the piece is currently on the board.
+"""
+import collections
+import functools
+import json
+import random
+import time
+
+from dlx import DancingLinks
+
+PIECE_COLORS_RGB = [
+    (255, 107, 107), (78, 205, 196), (255, 230, 109), (26, 83, 92), 
+    (247, 255, 247), (255, 50, 50), (100, 100, 255), (100, 255, 100),
+    (255, 100, 255), (100, 255, 255), (255, 150, 50), (150, 50, 255),
+    (50, 250, 150), (250, 50, 150), (50, 150, 250), (200, 200, 200)
+]
+
+LEVEL_SEED_BITS = 32 # Size of the generator seed stored in level IDs
+MIN_PIECE_SIZE = 3 # Pieces smaller than this are repaired by the generator
+PIECE_SIZE_RANGE = (6, 9) # Target size of the generated pieces, in triangles
+TRANSPOSITION_SIZE = 1 << 16 # Default capacity of the solver transposition table (0 disables it)
+ZOBRIST_SEED = 0x4E58 # Seed of the Zobrist keys, fixed so state hashes are reproducible
+UNIQUE_NODE_LIMIT = 100000 # Unique mode: partitions whose tilings are not settled within this many solver nodes are rejected
+MAX_GENERATION_ATTEMPTS = 200 # Partitions tried by the generator before it gives up (see GenerationError)
+
+
+class HexBoard:
+    """
+    A large hexagon made of small triangles.
+
+    The grid is represented as a dictionary where keys are (row, col) tuples
+    and values are the id of the piece covering the cell (or None when empty).
+    A triangle points UP when (row + col) is even and DOWN otherwise.
+
+    Alongside the dictionary (which is what the GUI renders) the board keeps an
+    integer bitmask of the occupied cells. Every cell owns one bit, assigned in
+    sorted (row, col) order, and every placement of a shape is precomputed as a
+    mask so fit tests reduce to a single `mask & occupied == 0`.
+    """
+    def __init__(self, side):
+        """
+        Initialize an empty board.
+
+        Args:
+            side (int): Number of triangles along each edge of the hexagon.
+        """
+        self.side = side
+        self.grid = {}
+        self.cells = []         # Bit index -> (row, col)
+        self.cell_index = {}    # (row, col) -> bit index
+        self.full_mask = 0      # Mask with one bit set per cell
+        self.up_mask = 0        # Mask of the cells pointing UP
+        self.neighbor_masks = []  # Bit index -> mask of the adjacent cells
+        self.neighbor_indices = ()  # Bit index -> tuple of the adjacent bit indices
+        self.zobrist_keys = []  # Bit index -> random 64-bit key (see zobrist)
+        self.occupied = 0       # Mask of the currently covered cells
+        self.filled = 0         # Number of covered cells
+        self.version = 0        # Incremented on every change of the grid (lets renderers cache it)
+        self._placement_cache = {}
+        self.init_hexagon_grid()
+
+    def init_hexagon_grid(self):
+        """
+        Initialize the hexagonal grid coordinates.
+
+        The grid structure creates a large hexagon composed of smaller triangles.
+        It does this by stacking rows of varying lengths (number of triangles).
+        Rows start shorter at the top, widen to the middle, and narrow again at the bottom.
+        """
+        self.grid = {}
+
+        # Calculate the maximum width of the hexagon (the middle rows).
+        # Formula breakdown:
+        # (2 * self.side + 1): The base width (number of triangles) of the top/bottom rows.
+        # 2 * (self.side - 1): The total expansion width added to reach the middle.
+        # For side=3: Base=7, Expansion=4, Max Width=11.
+        max_row_width = (2 * self.side + 1) + 2 * (self.side - 1)
+
+        total_rows = self.side * 2
+
+        for row_index in range(total_rows):
+            # Calculate how many triangles (columns) should be in this row.
+
+            # Upper Half (and middle-upper): Width increases by 2 each step
+            if row_index < self.side:
+                # Start with the base width and add 2 triangles for each row down (1 on each side)
+                num_triangles = (2 * self.side + 1) + 2 * row_index
+
+            # Lower Half: Width decreases
+            else:
+                # Calculate distance from the bottom to mirror the top half logic
+                # (total_rows - 1) is the index of the last row
+                rows_from_bottom = (total_rows - 1) - row_index
+                num_triangles = (2 * self.side + 1) + 2 * rows_from_bottom
+
+            # Calculate the horizontal offset (indentation) to center this row relative to the max width.
+            # Shorter rows need more offset to be centered.
+            col_offset = (max_row_width - num_triangles) // 2
+
+            # Populate the grid with coordinates for this row
+            for k in range(num_triangles):
+                col_index = col_offset + k
+                # Initialize the cell with None (indicating no piece is placed here yet)
+                self.grid[(row_index, col_index)] = None
+
+        # Assign one bit per cell. Sorted order keeps the bit order identical to the
+        # row-major scan order used by the solver.
+        self.cells = sorted(self.grid)
+        self.cell_index = {cell: i for i, cell in enumerate(self.cells)}
+        self.full_mask = (1 << len(self.cells)) - 1
+        self.up_mask = self.cell_mask(cell for cell in self.cells if sum(cell) % 2 == 0)
+        self.neighbor_masks = [
+            self.cell_mask(n for n in self.get_neighbors(*cell) if n in self.cell_index)
+            for cell in self.cells
+        ]
+        self.neighbor_indices = tuple(tuple(_bits(mask)) for mask in self.neighbor_masks)
+        rng = random.Random(ZOBRIST_SEED)
+        self.zobrist_keys = [rng.getrandbits(64) for _ in self.cells]
+        self.occupied = 0
+        self.filled = 0
+        self._placement_cache = {}
+        self._symmetries = None
+
+    def reset(self):
+        """
+        Empty every cell of the board.
+        """
+        for k in self.grid:
+            self.grid[k] = None
+        self.occupied = 0
+        self.filled = 0
+        self.version += 1
+
+    def placements(self, shape, parity=None):
+        """
+        Get every placement of a shape that lies entirely inside the board.
+
+        The table is computed once per distinct shape and cached on the board.
+
+        Args:
+            shape (list): List of relative coordinates (dr, dc) for the piece shape.
+            parity (int, optional): If set, only anchors with (r+c)%2 == parity are
+                kept. Anchoring a piece on the other parity flips every triangle and
+                mutates the shape, so the solvers always pass the piece anchor parity.
+
+        Returns:
+            dict: Maps each legal anchor (row, col) to the bitmask of the covered cells.
+        """
+        key = (tuple(shape), parity)
+        table = self._placement_cache.get(key)
+        if table is None:
+            table = {}
+            index = self.cell_index
+            for r, c in self.cells:
+                if parity is not None and (r + c) % 2 != parity:
+                    continue
+                mask = 0
+                for dr, dc in key[0]:
+                    bit = index.get((r + dr, c + dc))
+                    if bit is None:
+                        break
+                    mask |= 1 << bit
+                else:
+                    table[(r, c)] = mask
+            self._placement_cache[key] = table
+        return table
+
+    def symmetries(self):
+        """
+        Get the symmetries of the board as permutations of the cell bits.
+
+        Boards of odd side are regular hexagons with 12 symmetries (6 rotations,
+        each with and without a mirror). On even sides the rows are offset by one
+        triangle, the edges alternate between two lengths and fewer symmetries
+        remain. Candidates are the 12 rotations/reflections of the orientations()
+        lattice around the center of the board; only those mapping every cell to
+        a cell are kept. The first one is the identity. The result is computed
+        once per board.
+
+        Returns:
+            list: One list per symmetry, mapping each bit index to its image.
+        """
+        if self._symmetries is None:
+            # Lattice coordinates of the cells (see _orientations)
+            points = [(c, 3 * r + (2 if (r + c) % 2 == 0 else 1)) for r, c in self.cells]
+            lattice = {point: i for i, point in enumerate(points)}
+            n = len(points)
+            sum_x = sum(x for x, _ in points)
+            sum_y = sum(y for _, y in points)
+            # Coordinates relative to the centroid, scaled by 2n to stay integral
+            # (and even, as required by the rotation) whatever the centroid is
+            centered = [(2 * (n * x - sum_x), 2 * (n * y - sum_y)) for x, y in points]
+
+            self._symmetries = []
+            for mirrored in (False, True):
+                current = [(-x, y) for x, y in centered] if mirrored else centered
+                for _ in range(6):
+                    permutation = []
+                    for x, y in current:
+                        x, rx = divmod(x + 2 * sum_x, 2 * n)
+                        y, ry = divmod(y + 2 * sum_y, 2 * n)
+                        bit = None if rx or ry else lattice.get((x, y))
+                        if bit is None:
+                            break
+                        permutation.append(bit)
+                    else:
+                        self._symmetries.append(permutation)
+                    current = [((x - y) // 2, (3 * x + y) // 2) for x, y in current]
+        return self._symmetries
+
+    def transform_mask(self, mask, symmetry):
+        """
+        Apply a symmetry to a set of cells.
+
+        Args:
+            mask (int): Bitmask of the cells.
+            symmetry (list): A permutation from symmetries().
+
+        Returns:
+            int: Bitmask of the image cells.
+        """
+        image = 0
+        for bit in _bits(mask):
+            image |= 1 << symmetry[bit]
+        return image
+
+    def cell_mask(self, cells):
+        """
+        Build the bitmask covering a collection of (row, col) cells.
+
+        Args:
+            cells (iterable): (row, col) tuples, all of which must be on the board.
+
+        Returns:
+            int: The combined bitmask.
+        """
+        mask = 0
+        for cell in cells:
+            mask |= 1 << self.cell_index[cell]
+        return mask
+
+    def zobrist(self, mask):
+        """
+        Zobrist hash of a set of cells: the XOR of the keys of its cells.
+
+        Hashes of disjoint sets combine with XOR, so the hash of a search state
+        can be updated with one XOR per placement.
+
+        Args:
+            mask (int): Cell bitmask.
+
+        Returns:
+            int: 64-bit hash.
+        """
+        key = 0
+        for bit in _bits(mask):
+            key ^= self.zobrist_keys[bit]
+        return key
+
+    def regions(self, free):
+        """
+        Split a set of cells into its connected components (flood fill over
+        the neighbor relation of get_neighbors).
+
+        Args:
+            free (int): Mask of the cells to split, usually the empty cells.
+
+        Yields:
+            int: The mask of each connected component.
+        """
+        neighbor_masks = self.neighbor_masks
+        while free:
+            region = frontier = free & -free
+            while frontier:
+                low = frontier & -frontier
+                frontier ^= low
+                grown = neighbor_masks[low.bit_length() - 1] & free & ~region
+                region |= grown
+                frontier |= grown
+            free &= ~region
+            yield region
+
+    def get_neighbors(self, r, c):
+        """
+        Get the neighbors of a given cell in the grid.
+
+        Args:
+            r (int): Row index.
+            c (int): Column index.
+
+        Returns:
+            list: List of (row, col) tuples representing neighbor coordinates.
+        """
+        neighs = [(r, c-1), (r, c+1)]
+        if (r + c) % 2 == 0:
+            neighs.append((r + 1, c))
+        else:
+            neighs.append((r - 1, c))
+        return neighs
+
+    def can_place(self, shapes, r, c):
+        """
+        Check if a piece can be placed at the specified coordinates.
+
+        Args:
+            shapes (list): List of relative coordinates (dr, dc) for the piece shape.
+            r (int): Target row.
+            c (int): Target column.
+
+        Returns:
+            bool: True if the piece can be placed, False otherwise.
+        """
+        mask = self.placements(shapes).get((r, c))
+        return mask is not None and mask & self.occupied == 0
+
+    def place_piece(self, piece, r, c, remove=False):
+        """
+        Place or remove a piece from the grid.
+
+        Args:
+            piece (dict): The piece object to place/remove.
+            r (int): Row coordinate.
+            c (int): Column coordinate.
+            remove (bool): If True, removes the piece (sets grid cells to None).
+        """
+        mask = self.placements(piece['shape'])[(r, c)]
+        if remove:
+            self.occupied &= ~mask
+            self.filled -= len(piece['shape'])
+        else:
+            self.occupied |= mask
+            self.filled += len(piece['shape'])
+        # Keep the dictionary view in sync for rendering
+        for dr, dc in piece['shape']:
+            self.grid[(r+dr, c+dc)] = None if remove else piece['id']
+        piece['placed'] = not remove
+        if not remove:
+            piece['grid_pos'] = (r, c)
+        self.version += 1
+
+    def is_solved(self):
+        """
+        Check if the puzzle is completely solved.
+
+        Returns:
+            bool: True if all grid cells are filled, False otherwise.
+        """
+        return self.filled == len(self.cells)
+
+    def first_empty(self, occupied=None):
+        """
+        Get the bit index of the first empty cell in sorted (row, col) order.
+
+        Adding 1 to the occupied mask carries through the run of filled low bits and
+        sets exactly the first zero bit, so no scan over the cells is needed.
+
+        Args:
+            occupied (int, optional): Mask to inspect. Defaults to the board state.
+
+        Returns:
+            int: The bit index, or -1 if the board is full.
+        """
+        if occupied is None:
+            occupied = self.occupied
+        if occupied == self.full_mask:
+            return -1
+        return ((occupied + 1) & ~occupied).bit_length() - 1
+
+
+class GenerationError(Exception):
+    """
+    Raised by the generator when no partition was accepted within its attempt limit.
+    """
+
+
+class GenerationStats:
+    """
+    Counters of one generate_random_pieces run.
+
+    Attributes:
+        attempts (int): Number of partitions tried.
+        retries (int): Partitions thrown away because a fragment could not be repaired.
+        rejected (int): Partitions thrown away because they have several solutions (unique mode).
+        fragments (int): Pieces that ended up smaller than MIN_PIECE_SIZE and were repaired.
+        cells_moved (int): Cells taken over from a neighboring piece by a fragment.
+        merges (int): Fragments merged into a neighboring piece.
+        elapsed (float): Generation time, in seconds.
+    """
+    def __init__(self):
+        self.attempts = 0
+        self.retries = 0
+        self.rejected = 0
+        self.fragments = 0
+        self.cells_moved = 0
+        self.merges = 0
+        self.elapsed = 0.0
+
+    @property
+    def retry_rate(self):
+        """
+        Fraction of the attempts that were thrown away.
+        """
+        return self.retries / self.attempts if self.attempts else 0.0
+
+    def to_dict(self):
+        """
+        Get the counters as plain data.
+
+        Returns:
+            dict: JSON-serializable counters.
+        """
+        return {
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'retry_rate': self.retry_rate,
+            'rejected': self.rejected,
+            'fragments': self.fragments,
+            'cells_moved': self.cells_moved,
+            'merges': self.merges,
+            'elapsed': self.elapsed,
+        }
+
+
+class _RandomSet:
+    """
+    Set of ints with O(1) add, membership test and uniform random pop.
+
+    Items live in a list (swap-with-last removal) and a dict maps each item to
+    its position in the list.
+    """
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def pop_random(self, rng):
+        index = rng.randrange(len(self.items))
+        item = self.items[index]
+        last = self.items.pop()
+        if last != item:
+            self.items[index] = last
+            self.positions[last] = index
+        del self.positions[item]
+        return item
+
+
+def generate_random_pieces(board, rng=None, stats=None, unique=False, max_attempts=MAX_GENERATION_ATTEMPTS,
+                           cancel_event=None):
+    """
+    Generate random puzzle pieces to fill the grid.
+
+    This algorithm works by:
+    1. Starting with a full grid of available cells, visited in random order.
+    2. Taking the next unassigned cell as the start of a new piece.
+    3. "Growing" the piece by randomly adding unassigned neighbors until a desired size is reached.
+    4. Repeating this process until the entire grid is covered.
+    5. Repairing the fragments (pieces smaller than MIN_PIECE_SIZE, left in
+       gaps too small to grow): a fragment takes cells over from neighboring
+       pieces that can spare them, and if that is not enough it is merged into
+       its smallest neighbor (so a piece can exceed PIECE_SIZE_RANGE by up to
+       MIN_PIECE_SIZE - 1 cells). The whole partition is only redone if a
+       fragment has no neighbor at all (boards of less than MIN_PIECE_SIZE cells).
+    6. In unique mode, counting the solutions of the pieces in every orientation
+       the player can reach (the GUI flips, see flip_orientations) and starting
+       over until the board has a single tiling, up to the symmetries of the
+       board. This runs an exhaustive search per attempt, bounded by
+       UNIQUE_NODE_LIMIT: partitions it cannot settle are rejected too.
+       Unique levels get rare as the board grows, so the generator gives up
+       after max_attempts partitions.
+
+    The generator works on bit indices (see HexBoard.cells) with O(1) frontier
+    and start-cell structures, so its cost is linear in the number of cells.
+    All the randomness comes from `rng`, so the same seed always produces the
+    same pieces (see generate_level for seeds packed in level IDs).
+
+    Args:
+        board (HexBoard): The board to partition. It is left empty on return.
+        rng (random.Random, optional): Random number generator to draw from.
+            Defaults to a new, unseeded generator.
+        stats (GenerationStats, optional): Filled with the counters of this run.
+        unique (bool): Only accept partitions whose pieces have exactly one solution.
+        max_attempts (int): Number of partitions tried before giving up.
+        cancel_event (threading.Event, optional): When set, generation stops with
+            SolverCancelled (checked between attempts and during the unique searches).
+
+    Returns:
+        list: The generated piece objects.
+
+    Raises:
+        GenerationError: If no partition was accepted in max_attempts attempts.
+        SolverCancelled: If cancel_event was set.
+    """
+    if rng is None:
+        rng = random.Random()
+    if stats is None:
+        stats = GenerationStats()
+    start_time = time.perf_counter()
+
+    neighbors = board.neighbor_indices
+    num_cells = len(board.cells)
+
+    attempts = 0
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise SolverCancelled()
+        if attempts == max_attempts:
+            raise GenerationError(
+                f"No {'unique ' if unique else ''}level of side {board.side} found in {max_attempts} attempts"
+            )
+        attempts += 1
+        stats.attempts += 1
+        owner = [None] * num_cells  # Bit index -> index of the piece covering it
+        piece_cells = []            # Piece index -> list of bit indices
+
+        # Start cells are popped from the end of a shuffled list; cells already
+        # taken by a piece are skipped when popped instead of being removed early
+        start_order = list(range(num_cells))
+        rng.shuffle(start_order)
+
+        while start_order:
+            start_cell = start_order.pop()
+            if owner[start_cell] is not None:
+                continue
+
+            target_piece_size = rng.randint(*PIECE_SIZE_RANGE)
+            piece = len(piece_cells)
+            cells = [start_cell]
+            owner[start_cell] = piece
+            piece_cells.append(cells)
+
+            # Unassigned cells adjacent to the piece
+            frontier = _RandomSet()
+            for n in neighbors[start_cell]:
+                if owner[n] is None:
+                    frontier.add(n)
+
+            while len(cells) < target_piece_size and frontier:
+                next_cell = frontier.pop_random(rng)
+                owner[next_cell] = piece
+                cells.append(next_cell)
+                for n in neighbors[next_cell]:
+                    if owner[n] is None:
+                        frontier.add(n)
+
+        if not _repair_fragments(piece_cells, owner, neighbors, rng, stats):
+            stats.retries += 1
+            continue
+
+        pieces = build_pieces(board, piece_cells)
+        if unique and not _has_unique_solution(board, pieces, cancel_event):
+            stats.rejected += 1
+            continue
+        break
+
+    # Cleanup: Reset the main grid logical state to empty
+    for k in board.grid:
+        board.grid[k] = None
+
+    stats.elapsed += time.perf_counter() - start_time
+    return pieces
+
+
+def _has_unique_solution(board, pieces, cancel_event=None):
+    """
+    Check that pieces tile the board in exactly one way, up to the board symmetries,
+    in the orientations the player can reach (see generate_random_pieces).
+
+    Returns:
+        bool: True if the search proved a single tiling within UNIQUE_NODE_LIMIT nodes.
+    """
+    # Two distinct tilings with the pieces as generated are two with flips too, and
+    # this search is far smaller: most partitions are rejected here
+    solver = make_solver(board, pieces, 'dlx', animate=False, prune=True)
+    solver.cancel_event = cancel_event
+    if solver.count_solutions(2, symmetry=True) > 1:
+        return False
+    solver = make_solver(board, pieces, 'dlx', animate=False, prune=True, flips=True)
+    solver.cancel_event = cancel_event
+
+    def check_budget(solver):
+        if solver.stats.nodes >= UNIQUE_NODE_LIMIT:
+            raise SolverCancelled()
+
+    solver.on_progress = check_budget
+    try:
+        return solver.count_solutions(2, symmetry=True) == 1 and solver.stats.exhausted
+    except SolverCancelled:
+        if cancel_event is not None and cancel_event.is_set():
+            raise # Cancelled by the caller, not out of budget
+        return False
+
+
+def build_pieces(board, piece_cells, colors=None):
+    """
+    Build the piece objects of a partition, numbered in order.
+
+    Besides the keys used by the GUI and the solver, every piece records in
+    'solution_pos' the anchor it has in the partition, so the partition itself
+    is a known solution of the level.
+
+    Args:
+        board (HexBoard): The partitioned board.
+        piece_cells (list): Piece index -> list of bit indices (empty lists are skipped).
+        colors (list, optional): RGB color of every piece. Defaults to PIECE_COLORS_RGB
+            in turn.
+
+    Returns:
+        list: The piece objects.
+    """
+    pieces = []
+    for cells in piece_cells:
+        if not cells:
+            continue # Merged into another piece
+        piece_id = len(pieces)
+        coords = [board.cells[i] for i in cells]
+
+        # Normalize coordinates relative to top-left-most cell (reference)
+        # min() works lexographically: lowest row, then lowest col
+        ref_row, ref_col = min(coords)
+        relative_shape_coords = [(r - ref_row, c - ref_col) for r, c in coords]
+
+        # Assign a color
+        color = colors[piece_id] if colors else PIECE_COLORS_RGB[piece_id % len(PIECE_COLORS_RGB)]
+
+        # Calculate "Anchor Parity"
+        # This tracks whether the reference cell (0,0 in relative terms) points UP or DOWN.
+        # Essential for correctly rendering the shape if it's rotated later.
+        anchor_parity = (ref_row + ref_col) % 2
+
+        # Store piece object
+        # Positions will be set physically by 'layout_inventory' later.
+        # The 'rect' property stores the bounding box (pygame.Rect) of the piece on screen.
+        # It is calculated dynamically during rendering (in the draw() method) and used by the
+        # get_piece_under_mouse() method to detect if the mouse cursor is hovering over or clicking on this piece.
+        # Initially it is set to None since the piece hasn't been drawn yet.
+        pieces.append({
+            'id': piece_id,
+            'shape': relative_shape_coords,
+            'color': color,
+            'placed': False,
+            'anchor_parity': anchor_parity,
+            'screen_pos': (0, 0),
+            'reset_pos': (0, 0),
+            'rect': None,
+            'solution_pos': (ref_row, ref_col)
+        })
+    return pieces
+
+
+def _repair_fragments(piece_cells, owner, neighbors, rng, stats):
+    """
+    Bring every piece of a partition up to MIN_PIECE_SIZE cells (step 5 of
+    generate_random_pieces). Pieces merged away are left with an empty cell list.
+
+    Args:
+        piece_cells (list): Piece index -> list of bit indices. Modified in place.
+        owner (list): Bit index -> piece index. Modified in place.
+        neighbors (tuple): Bit index -> adjacent bit indices (see HexBoard.neighbor_indices).
+        rng (random.Random): Random number generator.
+        stats (GenerationStats): Repair counters to update.
+
+    Returns:
+        bool: False if a fragment could not be repaired (the partition must be redone).
+    """
+    fragments = [p for p, cells in enumerate(piece_cells) if len(cells) < MIN_PIECE_SIZE]
+    stats.fragments += len(fragments)
+
+    for piece in fragments:
+        cells = piece_cells[piece]
+
+        # Take over adjacent cells whose piece stays large enough and connected
+        while cells and len(cells) < MIN_PIECE_SIZE:
+            candidates = sorted({
+                n for c in cells for n in neighbors[c]
+                if owner[n] != piece
+                and len(piece_cells[owner[n]]) > MIN_PIECE_SIZE
+                and _stays_connected(piece_cells[owner[n]], n, neighbors)
+            })
+            if not candidates:
+                break
+            cell = rng.choice(candidates)
+            piece_cells[owner[cell]].remove(cell)
+            owner[cell] = piece
+            cells.append(cell)
+            stats.cells_moved += 1
+
+        if not cells or len(cells) >= MIN_PIECE_SIZE:
+            continue
+
+        # Otherwise merge the fragment into its smallest neighbor
+        adjacent = {owner[n] for c in cells for n in neighbors[c] if owner[n] != piece}
+        if not adjacent:
+            return False
+        target = min(adjacent, key=lambda p: (len(piece_cells[p]), p))
+        for c in cells:
+            owner[c] = target
+        piece_cells[target].extend(cells)
+        piece_cells[piece] = []
+        stats.merges += 1
+        # A merged pair of fragments may still be too small
+        if len(piece_cells[target]) < MIN_PIECE_SIZE and target < piece:
+            fragments.append(target)
+
+    return True
+
+
+def _stays_connected(cells, removed, neighbors):
+    """
+    Check that a piece remains connected once one of its cells is removed.
+
+    Args:
+        cells (list): Bit indices of the piece.
+        removed (int): The cell to remove.
+        neighbors (tuple): Bit index -> adjacent bit indices (see HexBoard.neighbor_indices).
+
+    Returns:
+        bool: True if the remaining cells form a single connected region.
+    """
+    remaining = set(cells)
+    remaining.discard(removed)
+    if not remaining:
+        return False
+    stack = [next(iter(remaining))]
+    seen = {stack[0]}
+    while stack:
+        c = stack.pop()
+        for n in neighbors[c]:
+            if n in remaining and n not in seen:
+                seen.add(n)
+                stack.append(n)
+    return len(seen) == len(remaining)
+
+
+def make_level_id(side, seed=None, unique=False):
+    """
+    Build a level ID: the board side and the generator seed, e.g. "4-1f3a9c07",
+    with a "u" suffix for unique-solution levels ("4-1f3a9c07u").
+
+    Args:
+        side (int): Side of the board.
+        seed (int, optional): Generator seed (LEVEL_SEED_BITS bits). Drawn at random if None.
+        unique (bool): Whether the level is generated with a unique solution.
+
+    Returns:
+        str: The level ID.
+    """
+    if seed is None:
+        seed = random.getrandbits(LEVEL_SEED_BITS)
+    return f"{side}-{seed:0{LEVEL_SEED_BITS // 4}x}{'u' if unique else ''}"
+
+
+def parse_level_id(level_id):
+    """
+    Split a level ID into its board side, seed and unique flag.
+
+    Args:
+        level_id (str): A level ID as built by make_level_id.
+
+    Returns:
+        tuple: (side, seed, unique)
+
+    Raises:
+        ValueError: If the ID is malformed.
+    """
+    error = f"Invalid level ID: {level_id!r} (expected SIDE-HEXSEED[u], e.g. '4-1f3a9c07')"
+    side_text, _, seed_text = level_id.strip().partition('-')
+    unique = seed_text.endswith('u')
+    if unique:
+        seed_text = seed_text[:-1]
+    try:
+        side = int(side_text)
+        seed = int(seed_text, 16)
+    except ValueError:
+        raise ValueError(error) from None
+    if side < 1 or not 0 <= seed < 1 << LEVEL_SEED_BITS:
+        raise ValueError(error)
+    return side, seed, unique
+
+
+def generate_level(level_id, board=None, stats=None, cancel_event=None):
+    """
+    Generate the pieces of a level. The same ID always gives the same pieces.
+
+    Args:
+        level_id (str): A level ID (see make_level_id).
+        board (HexBoard, optional): Board to partition. Its side must match the ID.
+            A new board is created if None.
+        stats (GenerationStats, optional): Filled with the generator counters.
+        cancel_event (threading.Event, optional): Stops the generation when set
+            (see generate_random_pieces).
+
+    Returns:
+        tuple: (board, pieces)
+
+    Raises:
+        GenerationError: If the generator gave up (unique levels, see generate_random_pieces).
+    """
+    side, seed, unique = parse_level_id(level_id)
+    if board is None:
+        board = HexBoard(side)
+    elif board.side != side:
+        raise ValueError(f"Level {level_id} needs a board of side {side}, got {board.side}")
+    return board, generate_random_pieces(board, random.Random(seed), stats, unique=unique, cancel_event=cancel_event)
+
+
+class SolverCancelled(Exception):
+    """
+    Raised inside a search when its cancel event is set.
+    """
+
+
+class SolverStats:
+    """
+    Instrumentation of one search.
+
+    The counters are always maintained. The per-depth and per-piece tables are
+    only filled when the solver runs with profile=True, since they cost a clock
+    read per node.
+
+    Attributes:
+        nodes (int): Placements explored.
+        backtracks (int): Placements undone.
+        pruned (int): Placements cut by region pruning.
+        max_depth (int): Largest number of pieces placed at once.
+        elapsed (float): Time spent searching, in seconds (pauses between animated
+            steps are not counted).
+        solved (bool): Whether the search found a solution.
+        solutions (int): Number of solutions found (see Solver.count_solutions).
+        duplicates (int): Solutions skipped as equivalent to one already counted
+            (symmetry mode of Solver.count_solutions).
+        nodes_to_first (int): Nodes explored when the first solution was found.
+        exhausted (bool): Whether the whole search tree was explored, i.e. the
+            search was neither stopped by a solution limit nor cancelled.
+        decisions (int): Search nodes with at least one placement that fits.
+        forced (int): Search nodes with exactly one placement that fits.
+        tt_lookups (int): Transposition table probes (one per candidate placement).
+        tt_hits (int): Placements skipped because their resulting state was
+            already proven dead.
+        tt_stores (int): Dead states recorded in the transposition table.
+        tt_evictions (int): Least recently used states dropped to respect its size.
+        depth_nodes (list): Depth -> number of nodes explored at that depth (profile only).
+        depth_time (list): Depth -> seconds spent while that many pieces were placed (profile only).
+        piece_attempts (dict): Piece id -> number of placements tried for it,
+            including the ones that did not fit (profile only).
+    """
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.pruned = 0
+        self.max_depth = 0
+        self.elapsed = 0.0
+        self.solved = False
+        self.solutions = 0
+        self.duplicates = 0
+        self.nodes_to_first = 0
+        self.exhausted = False
+        self.decisions = 0
+        self.forced = 0
+        self.tt_lookups = 0
+        self.tt_hits = 0
+        self.tt_stores = 0
+        self.tt_evictions = 0
+        self.depth_nodes = []
+        self.depth_time = []
+        self.piece_attempts = {}
+
+    @property
+    def nodes_per_sec(self):
+        """
+        Average search speed.
+        """
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def forced_ratio(self):
+        """
+        Fraction of the decisions that had a single option.
+        """
+        return self.forced / self.decisions if self.decisions else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        """
+        Fraction of the transposition table probes that found a dead state.
+        """
+        return self.tt_hits / self.tt_lookups if self.tt_lookups else 0.0
+
+    def to_dict(self):
+        """
+        Get the statistics as plain data.
+
+        Returns:
+            dict: JSON-serializable statistics.
+        """
+        return {
+            'nodes': self.nodes,
+            'backtracks': self.backtracks,
+            'pruned': self.pruned,
+            'max_depth': self.max_depth,
+            'elapsed': self.elapsed,
+            'nodes_per_sec': self.nodes_per_sec,
+            'solved': self.solved,
+            'solutions': self.solutions,
+            'duplicates': self.duplicates,
+            'nodes_to_first': self.nodes_to_first,
+            'exhausted': self.exhausted,
+            'decisions': self.decisions,
+            'forced': self.forced,
+            'forced_ratio': self.forced_ratio,
+            'tt_lookups': self.tt_lookups,
+            'tt_hits': self.tt_hits,
+            'tt_stores': self.tt_stores,
+            'tt_evictions': self.tt_evictions,
+            'tt_hit_rate': self.tt_hit_rate,
+            'depth_nodes': list(self.depth_nodes),
+            'depth_time': list(self.depth_time),
+            'piece_attempts': {str(k): v for k, v in sorted(self.piece_attempts.items())},
+        }
+
+    def to_json(self, path=None):
+        """
+        Serialize the statistics as JSON.
+
+        Args:
+            path (str, optional): If set, the JSON is also written to this file.
+
+        Returns:
+            str: The JSON text.
+        """
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+
+class Solver:
+    """
+    Base class of the solver strategies.
+
+    Subclasses implement `_run()`, a generator that yields False after each
+    animated step and returns True (as the generator return value) once
+    `self.solution` holds a complete tiling.
+    """
+    def __init__(self, board, pieces, animate=True, prune=False, all_orientations=False, profile=False,
+                 transposition_size=TRANSPOSITION_SIZE, flips=False):
+        """
+        Prepare a search on the current board state.
+
+        Args:
+            board (HexBoard): The board to fill. Already covered cells are kept.
+            pieces (list): The piece objects available to the solver. Pieces with
+                'placed' set are considered already on the board.
+            animate (bool): If True, every placement and backtrack is written to
+                the board and yielded, so a GUI can draw the search as it runs.
+                If False, the search only works on bitmasks and the board is
+                updated once, with the final solution.
+            prune (bool): If True, after each placement the empty cells are split
+                into connected regions and the branch is abandoned as soon as one
+                region cannot be filled by the remaining pieces (see is_dead_end).
+            all_orientations (bool): If True, every rotation and reflection of each
+                piece is tried (see orientations()), and placed pieces take the
+                orientation of the solution. If False, pieces keep their current
+                'shape' and 'anchor_parity'.
+            profile (bool): If True, also collect time per depth level and per-piece
+                placement attempts in self.stats.
+            transposition_size (int): Capacity of the transposition table. The same
+                set of covered cells and placed pieces is often reached through
+                different placement orders; states whose subtree holds no tiling
+                are remembered (least recently used first out) and never explored
+                twice. 0 disables the table.
+            flips (bool): If True (and all_orientations is False), the pieces may take
+                the orientations the player can reach with the GUI flips (see
+                flip_orientations), and placed pieces take the orientation of the solution.
+        """
+        self.board = board
+        self.pieces = pieces
+        self.animate = animate
+        self.prune = prune
+        self.all_orientations = all_orientations
+        self.flips = flips
+        self.profile = profile
+        self.transposition_size = transposition_size
+        # Candidate orientations of every piece, as (shape, anchor parity) pairs
+        if all_orientations:
+            self.orientations = [orientations(p['shape'], p['anchor_parity']) for p in pieces]
+        elif flips:
+            self.orientations = [flip_orientations(p['shape'], p['anchor_parity']) for p in pieces]
+        else:
+            self.orientations = [[(tuple(p['shape']), p['anchor_parity'])] for p in pieces]
+        # Placement tables of every orientation of every piece, looked up by anchor cell
+        self.tables = [
+            [board.placements(shape, parity) for shape, parity in options]
+            for options in self.orientations
+        ]
+        self.sizes = [len(p['shape']) for p in pieces]
+        # Possible up/down balances of every piece: (# UP triangles) - (# DOWN triangles).
+        # Rotating a piece by 60 degrees swaps UP and DOWN, so free pieces have two.
+        self.balances = [
+            sorted({shape_balance(shape, parity) for shape, parity in options})
+            for options in self.orientations
+        ]
+        self.solution = []  # Stack of (piece index, orientation index, anchor) for the current branch
+        self.stats = SolverStats()
+        self._tick_time = 0.0   # Profiling: time of the last depth change
+        # Optional threading/multiprocessing Event. Once set, the search raises SolverCancelled.
+        self.cancel_event = None
+        # Optional callable, called with the solver every 1024 nodes (e.g. to publish progress)
+        self.on_progress = None
+        # Number of solutions to find before the search stops (None: explore the whole tree)
+        self.solution_limit = 1
+        # Canonical forms of the tilings counted so far, and the cells covered before
+        # the search (symmetry mode of count_solutions)
+        self._seen_tilings = None
+        self._fixed_mask = 0
+        # Zobrist keys of the pieces. A search state (covered cells, placed pieces) hashes
+        # to the XOR of the keys of its cells and of its pieces.
+        rng = random.Random(ZOBRIST_SEED + 1)
+        self._piece_keys = [rng.getrandbits(64) for _ in pieces]
+        # Transposition table of the current search: state hash -> (occupied, used)
+        # of the proven-dead states, in least recently used order (None if disabled)
+        self._dead_states = None
+
+    def steps(self):
+        """
+        Coroutine generator running the search.
+
+        Yields:
+            bool: True if solved, False if continuing search (animate mode only).
+        """
+        if (yield from self._timed_search()):
+            if not self.animate:
+                for i, k, anchor in self.solution:
+                    self.place(i, k, anchor)
+            yield True
+
+    def _timed_search(self):
+        """
+        Run the search with fresh statistics.
+
+        Returns:
+            bool: True if the search stopped on a solution (then in self.solution).
+        """
+        self.solution = []
+        self.stats = stats = SolverStats()
+        # States proven dead depend on the placement tables, which count_solutions may swap
+        self._dead_states = collections.OrderedDict() if self.transposition_size > 0 else None
+        if self.profile:
+            for piece in self.pieces:
+                stats.piece_attempts[piece['id']] = 0
+
+        # Drive the search by hand so the time between animated steps is not counted
+        search = self._run()
+        start = self._tick_time = time.perf_counter()
+        try:
+            while True:
+                try:
+                    next(search)
+                except StopIteration as finished:
+                    stopped = bool(finished.value)
+                    stats.exhausted = not stopped
+                    break
+                stats.elapsed += time.perf_counter() - start
+                start = None # Paused: closing the search now must not count the pause
+                yield False
+                start = self._tick_time = time.perf_counter()
+        finally:
+            if start is not None:
+                stats.elapsed += time.perf_counter() - start
+                if self.profile:
+                    self._tick(len(self.solution))
+            stats.solved = stats.solutions > 0
+        return stopped
+
+    def solve(self):
+        """
+        Run the search to completion.
+
+        Returns:
+            bool: True if a solution was found (the board is left solved), False otherwise.
+        """
+        for res in self.steps():
+            if res is True:
+                return True
+        return False
+
+    def count_solutions(self, limit=None, symmetry=False):
+        """
+        Count the tilings of the board. The board is left as it was.
+
+        In symmetry mode, tilings are compared as sets of covered regions, up to
+        the symmetries of the board (see HexBoard.symmetries): tilings that only
+        differ by a rotation or reflection of the whole board, or by swapping
+        identical pieces, are counted once. When pieces may change orientation and
+        the board is empty, the search is also reduced: under the board symmetries
+        that map the placements of every piece onto placements of the same piece
+        (all of them with all_orientations, the mirror images with flips), the
+        piece with the most orientations is only tried in one placement per class
+        of symmetric placements.
+
+        Args:
+            limit (int, optional): Stop once this many solutions are found. If None,
+                the whole search tree is explored.
+            symmetry (bool): Count distinct tilings only.
+
+        Returns:
+            int: The number of solutions found. It is exact if stats.exhausted is
+                True, a lower bound otherwise.
+        """
+        animate, solution_limit, tables = self.animate, self.solution_limit, self.tables
+        self.animate, self.solution_limit = False, limit
+        if symmetry:
+            self._seen_tilings = set()
+            self._fixed_mask = self.board.occupied
+            if (self.all_orientations or self.flips) and not self.board.occupied and self.pieces:
+                symmetries = self._problem_symmetries()
+                if symmetries:
+                    self.tables = list(tables)
+                    anchor_piece = max(range(len(self.pieces)), key=lambda i: len(self.orientations[i]))
+                    self.tables[anchor_piece] = self._canonical_placements(tables[anchor_piece], symmetries)
+        try:
+            for _ in self._timed_search():
+                pass
+        finally:
+            self.animate, self.solution_limit, self.tables = animate, solution_limit, tables
+            self._seen_tilings = None
+            self._dead_states = None
+            self.solution = []
+        return self.stats.solutions
+
+    def _problem_symmetries(self):
+        """
+        Get the board symmetries that leave the puzzle unchanged: those mapping the
+        set of placements of every piece onto itself. Any tiling is then mapped to
+        another tiling, so the search may skip symmetric placements of one piece.
+
+        Returns:
+            list: The non-identity symmetries (permutations from HexBoard.symmetries).
+        """
+        board = self.board
+        placement_sets = [
+            {mask for table in tables for mask in table.values()}
+            for tables in self.tables
+        ]
+        return [
+            symmetry for symmetry in board.symmetries()[1:]
+            if all(
+                all(board.transform_mask(mask, symmetry) in masks for mask in masks)
+                for masks in placement_sets
+            )
+        ]
+
+    def _canonical_placements(self, tables, symmetries):
+        """
+        Keep one placement per class of placements equivalent under some board symmetries.
+
+        Args:
+            tables (list): Orientation index -> {anchor: mask} of one piece, covering
+                every orientation of the piece.
+            symmetries (list): Symmetries leaving the puzzle unchanged (see _problem_symmetries).
+
+        Returns:
+            list: The filtered tables.
+        """
+        board = self.board
+        return [
+            {
+                anchor: mask for anchor, mask in table.items()
+                if all(mask <= board.transform_mask(mask, symmetry) for symmetry in symmetries)
+            }
+            for table in tables
+        ]
+
+    def _tiling_key(self):
+        """
+        Canonical form of the tiling in self.solution: the smallest, over the board
+        symmetries, of the sorted tuple of covered regions.
+        """
+        board = self.board
+        masks = [self.tables[i][k][anchor] for i, k, anchor in self.solution]
+        if self._fixed_mask:
+            masks.append(self._fixed_mask)
+        return min(
+            tuple(sorted(board.transform_mask(mask, symmetry) for mask in masks))
+            for symmetry in board.symmetries()
+        )
+
+    def place(self, i, k, anchor, remove=False):
+        """
+        Place or remove a piece on the board in one of its candidate orientations.
+
+        Args:
+            i (int): Piece index.
+            k (int): Orientation index in self.orientations[i].
+            anchor (tuple): The (row, col) anchor cell.
+            remove (bool): If True, removes the piece.
+        """
+        piece = self.pieces[i]
+        if not remove and (self.all_orientations or self.flips):
+            shape, parity = self.orientations[i][k]
+            piece['shape'] = list(shape)
+            piece['anchor_parity'] = parity
+        self.board.place_piece(piece, *anchor, remove=remove)
+
+    def _state_key(self, occupied, used):
+        """
+        Zobrist hash of a search state.
+
+        Args:
+            occupied (int): Mask of the covered cells.
+            used (int): Mask (over piece indices) of the pieces already placed.
+        """
+        key = self.board.zobrist(occupied)
+        for i in _bits(used):
+            key ^= self._piece_keys[i]
+        return key
+
+    def _placement_key(self, i, mask):
+        """
+        Zobrist hash change caused by placing piece `i` on the cells of `mask`.
+        """
+        return self.board.zobrist(mask) ^ self._piece_keys[i]
+
+    def _is_dead(self, key, occupied, used):
+        """
+        Look a state up in the transposition table.
+
+        Only the hash is used as the table key; the stored masks are compared
+        as well, so a hash collision is a miss, never a wrong cut.
+
+        Args:
+            key (int): Zobrist hash of the state.
+            occupied (int): Mask of the covered cells.
+            used (int): Mask (over piece indices) of the pieces already placed.
+
+        Returns:
+            bool: True if the state is known to lead to no tiling.
+        """
+        stats = self.stats
+        stats.tt_lookups += 1
+        state = self._dead_states.get(key)
+        if state is None or state[0] != occupied or state[1] != used:
+            return False
+        self._dead_states.move_to_end(key)
+        stats.tt_hits += 1
+        return True
+
+    def _record_dead(self, key, occupied, used):
+        """
+        Remember a state whose subtree holds no tiling, evicting the least
+        recently used state if the table is full.
+        """
+        dead_states = self._dead_states
+        dead_states[key] = (occupied, used)
+        dead_states.move_to_end(key)
+        self.stats.tt_stores += 1
+        if len(dead_states) > self.transposition_size:
+            dead_states.popitem(last=False)
+            self.stats.tt_evictions += 1
+
+    def _visit_node(self):
+        """
+        Account for one explored placement (called before it is pushed on the
+        solution stack), honor cancellation requests and report progress. Both
+        hooks run every 1024 nodes to keep the check cheap.
+        """
+        stats = self.stats
+        stats.nodes += 1
+        depth = len(self.solution) + 1
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+        if self.profile:
+            self._tick(depth - 1)
+            while len(stats.depth_nodes) <= depth:
+                stats.depth_nodes.append(0)
+            stats.depth_nodes[depth] += 1
+        if not stats.nodes & 1023:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise SolverCancelled()
+            if self.on_progress is not None:
+                self.on_progress(self)
+
+    def _branch(self, options):
+        """
+        Account for one decision: `options` placements fit at this node.
+        """
+        if options:
+            self.stats.decisions += 1
+            if options == 1:
+                self.stats.forced += 1
+
+    def _found_solution(self):
+        """
+        Account for a complete tiling (held in self.solution).
+
+        Returns:
+            bool: True if the search must stop here (solution limit reached).
+        """
+        stats = self.stats
+        if self._seen_tilings is not None:
+            key = self._tiling_key()
+            if key in self._seen_tilings:
+                stats.duplicates += 1
+                return False
+            self._seen_tilings.add(key)
+        stats.solutions += 1
+        if stats.solutions == 1:
+            stats.nodes_to_first = stats.nodes
+        return self.solution_limit is not None and stats.solutions >= self.solution_limit
+
+    def _backtrack(self):
+        """
+        Account for one undone placement (called after it is popped).
+        """
+        self.stats.backtracks += 1
+        if self.profile:
+            self._tick(len(self.solution) + 1)
+
+    def _tick(self, depth):
+        """
+        Profiling: charge the time since the last depth change to `depth`.
+        """
+        now = time.perf_counter()
+        depth_time = self.stats.depth_time
+        while len(depth_time) <= depth:
+            depth_time.append(0.0)
+        depth_time[depth] += now - self._tick_time
+        self._tick_time = now
+
+    def used_mask(self):
+        """
+        Get the bitmask (over piece indices) of the pieces already on the board.
+        """
+        used = 0
+        for i, piece in enumerate(self.pieces):
+            if piece['placed']:
+                used |= 1 << i
+        return used
+
+    def is_dead_end(self, occupied, used):
+        """
+        Check whether the empty cells contain a region that no combination of the
+        remaining pieces can fill exactly.
+
+        A region is dead if it is smaller than the smallest remaining piece, if
+        its size is not a sum of remaining piece sizes, or if its up/down triangle
+        balance is not a sum of remaining piece balances.
+
+        Args:
+            occupied (int): Mask of the covered cells.
+            used (int): Mask (over piece indices) of the pieces already placed.
+
+        Returns:
+            bool: True if the current branch cannot lead to a solution.
+        """
+        board = self.board
+        free = board.full_mask & ~occupied
+        if not free:
+            return False
+
+        # Subset sums of the remaining sizes and balances, as bitsets.
+        # Balances can be negative, so that bitset is offset by the sum of the negative ones.
+        size_sums = 1
+        min_size = None
+        negative = sum(-b[0] for i, b in enumerate(self.balances) if not used >> i & 1 and b[0] < 0)
+        balance_sums = 1 << negative
+        for i, size in enumerate(self.sizes):
+            if used >> i & 1:
+                continue
+            size_sums |= size_sums << size
+            sums = balance_sums
+            for balance in self.balances[i]:
+                sums |= balance_sums << balance if balance >= 0 else balance_sums >> -balance
+            balance_sums = sums
+            if min_size is None or size < min_size:
+                min_size = size
+        if min_size is None:
+            return True
+
+        up_mask = board.up_mask
+        for region in board.regions(free):
+            size = region.bit_count()
+            if size < min_size or not size_sums >> size & 1:
+                return True
+            offset = 2 * (region & up_mask).bit_count() - size + negative
+            if offset < 0 or not balance_sums >> offset & 1:
+                return True
+        return False
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class BacktrackingSolver(Solver):
+    """
+    First-empty-cell backtracking over the board bitmask.
+
+    The cell with the lowest bit index that is still empty must be covered by the
+    anchor (top-left-most cell) of some unused piece, so each search node only
+    tries the precomputed placements anchored at that cell.
+    Pieces are tried in list order.
+    """
+    def _run(self):
+        self._index_by_anchor()
+        occupied, used = self.board.occupied, self.used_mask()
+        return self._search(occupied, self.board.filled, used, self._state_key(occupied, used))
+
+    def _index_by_anchor(self):
+        # Every candidate placement, grouped by anchor cell:
+        # anchor -> [(piece, orientation, mask, Zobrist key of the placement)]
+        self.by_anchor = {}
+        for i, tables in enumerate(self.tables):
+            for k, table in enumerate(tables):
+                for anchor, mask in table.items():
+                    self.by_anchor.setdefault(anchor, []).append((i, k, mask, self._placement_key(i, mask)))
+
+    def branches(self, depth):
+        """
+        Enumerate the top of the search tree, for splitting a search into subtrees.
+
+        Args:
+            depth (int): Number of placement levels to expand.
+
+        Returns:
+            list: One list of (piece index, orientation index, anchor) placements per
+                subtree, in search order. Branches cut by pruning are left out, and
+                branches that complete the board early are kept as they are.
+        """
+        self._index_by_anchor()
+        board = self.board
+        prefixes = []
+        prefix = []
+
+        def expand(occupied, filled, used):
+            if len(prefix) == depth or filled == len(board.cells):
+                prefixes.append(list(prefix))
+                return
+            anchor = board.cells[((occupied + 1) & ~occupied).bit_length() - 1]
+            for i, k, mask, _ in self.by_anchor.get(anchor, ()):
+                if used >> i & 1 or mask & occupied:
+                    continue
+                if self.prune and self.is_dead_end(occupied | mask, used | 1 << i):
+                    continue
+                prefix.append((i, k, anchor))
+                expand(occupied | mask, filled + self.sizes[i], used | 1 << i)
+                prefix.pop()
+
+        expand(board.occupied, board.filled, self.used_mask())
+        return prefixes
+
+    def _search(self, occupied, filled, used, key):
+        """
+        Recursive search step. Returns True (as the generator return value) once
+        the board is full and the solution limit is reached.
+
+        The occupied mask, the filled-cell count and the state hash are passed
+        down the recursion, so undoing a placement on backtrack is just returning
+        to the caller's values.
+        """
+        board = self.board
+        stats = self.stats
+        if filled == len(board.cells):
+            return self._found_solution()
+
+        # First empty cell: lowest zero bit of the occupied mask
+        anchor = board.cells[((occupied + 1) & ~occupied).bit_length() - 1]
+
+        fitting = []
+        for i, k, mask, placement_key in self.by_anchor.get(anchor, ()):
+            if used >> i & 1:
+                continue
+            if self.profile:
+                stats.piece_attempts[self.pieces[i]['id']] += 1
+            if not mask & occupied:
+                fitting.append((i, k, mask, placement_key))
+        self._branch(len(fitting))
+
+        memo = self._dead_states is not None
+        for i, k, mask, placement_key in fitting:
+            child_key = key ^ placement_key
+            if memo and self._is_dead(child_key, occupied | mask, used | 1 << i):
+                continue
+            if self.prune and self.is_dead_end(occupied | mask, used | 1 << i):
+                stats.pruned += 1
+                if memo:
+                    self._record_dead(child_key, occupied | mask, used | 1 << i)
+                continue
+            self._visit_node()
+            tilings = stats.solutions + stats.duplicates
+
+            self.solution.append((i, k, anchor))
+            if self.animate:
+                self.place(i, k, anchor)
+                yield False # Step done, continue
+
+            if (yield from self._search(occupied | mask, filled + self.sizes[i], used | 1 << i, child_key)):
+                return True
+
+            self.solution.pop()
+            if memo and stats.solutions + stats.duplicates == tilings:
+                self._record_dead(child_key, occupied | mask, used | 1 << i)
+            self._backtrack()
+            if self.animate:
+                self.place(i, k, anchor, remove=True)
+                yield False # Backtrack step
+        return False
+
+
+class DLXSolver(Solver):
+    """
+    Exact cover search with Dancing Links (Algorithm X).
+
+    Every free cell and every unused piece is a column, every placement of a piece
+    (in every candidate orientation) that only covers free cells is a row. At each
+    node the column with the fewest remaining rows is branched on, which is usually
+    a cell with a single possible filler or a piece with a single possible spot.
+    """
+    def _run(self):
+        links, occupied, used = self._build_links()
+        return self._search(links, occupied, used, self._state_key(occupied, used))
+
+    def _build_links(self):
+        """
+        Build the exact cover matrix of the current board (see the class docstring)
+        and set self.rows.
+
+        Returns:
+            tuple: (DancingLinks, occupied mask, used-piece mask) of the current board.
+        """
+        board = self.board
+        occupied = board.occupied
+        used = self.used_mask()
+
+        # Compact column numbering: free cells first, then unused pieces
+        free_cells = [b for b in range(len(board.cells)) if not occupied >> b & 1]
+        column_of_bit = {b: k for k, b in enumerate(free_cells)}
+        piece_column = {}
+        for i in range(len(self.pieces)):
+            if not used >> i & 1:
+                piece_column[i] = len(free_cells) + len(piece_column)
+
+        self.rows = []  # Row index -> (piece index, orientation index, anchor, mask, Zobrist key)
+        matrix = []
+        for i, col in piece_column.items():
+            for k, table in enumerate(self.tables[i]):
+                for anchor, mask in table.items():
+                    if mask & occupied:
+                        continue
+                    columns = [column_of_bit[b] for b in _bits(mask)]
+                    columns.append(col)
+                    matrix.append(columns)
+                    self.rows.append((i, k, anchor, mask, self._placement_key(i, mask)))
+
+        return DancingLinks(len(free_cells) + len(piece_column), matrix), occupied, used
+
+    def branches(self, depth):
+        """
+        Enumerate the top of the search tree, for splitting a search into subtrees.
+
+        The tree is the one _search explores: each level branches on the column
+        with the fewest remaining rows, so the subtrees, in order, are the ones a
+        serial search would go through. Forced columns (a single row) do not
+        split anything and do not count as a level.
+
+        Args:
+            depth (int): Number of branching levels to expand.
+
+        Returns:
+            list: One list of (piece index, orientation index, anchor) placements per
+                subtree, in search order. Branches cut by pruning or left with an
+                uncoverable column are left out, and branches that complete the
+                board early are kept as they are.
+        """
+        links, occupied, used = self._build_links()
+        prefixes = []
+        prefix = []
+
+        def expand(occupied, used, levels):
+            header = links.choose_column()
+            if levels == depth or header == 0:
+                prefixes.append(list(prefix))
+                return
+            if links.S[header] == 0:
+                return
+            forced = links.S[header] == 1
+            links.cover(header)
+            node = links.D[header]
+            while node != header:
+                i, k, anchor, mask, _ = self.rows[links.row_id[node]]
+                if not (self.prune and self.is_dead_end(occupied | mask, used | 1 << i)):
+                    links.select(node)
+                    prefix.append((i, k, anchor))
+                    expand(occupied | mask, used | 1 << i, levels if forced else levels + 1)
+                    prefix.pop()
+                    links.deselect(node)
+                node = links.D[node]
+            links.uncover(header)
+
+        expand(occupied, used, 0)
+        return prefixes
+
+    def _search(self, links, occupied, used, key):
+        """
+        Recursive Algorithm X step. Returns True (as the generator return value)
+        once every column is covered and the solution limit is reached; the links
+        are then left as they are.
+        """
+        stats = self.stats
+        header = links.choose_column()
+        if header == 0:
+            return self._found_solution()
+        if links.S[header] == 0:
+            return False
+        self._branch(links.S[header])
+
+        memo = self._dead_states is not None
+        links.cover(header)
+        node = links.D[header]
+        while node != header:
+            i, k, anchor, mask, placement_key = self.rows[links.row_id[node]]
+            if self.profile:
+                stats.piece_attempts[self.pieces[i]['id']] += 1
+            child_key = key ^ placement_key
+            if memo and self._is_dead(child_key, occupied | mask, used | 1 << i):
+                node = links.D[node]
+                continue
+            if self.prune and self.is_dead_end(occupied | mask, used | 1 << i):
+                stats.pruned += 1
+                if memo:
+                    self._record_dead(child_key, occupied | mask, used | 1 << i)
+                node = links.D[node]
+                continue
+            self._visit_node()
+            tilings = stats.solutions + stats.duplicates
+
+            links.select(node)
+            self.solution.append((i, k, anchor))
+            if self.animate:
+                self.place(i, k, anchor)
+                yield False # Step done, continue
+
+            if (yield from self._search(links, occupied | mask, used | 1 << i, child_key)):
+                return True
+
+            self.solution.pop()
+            if memo and stats.solutions + stats.duplicates == tilings:
+                self._record_dead(child_key, occupied | mask, used | 1 << i)
+            self._backtrack()
+            if self.animate:
+                self.place(i, k, anchor, remove=True)
+                yield False # Backtrack step
+            links.deselect(node)
+            node = links.D[node]
+        links.uncover(header)
+        return False
+
+
+# Available solver strategies, selectable by name
+SOLVER_STRATEGIES = {
+    'backtrack': BacktrackingSolver,
+    'dlx': DLXSolver,
+}
+
+
+def make_solver(board, pieces, strategy='backtrack', animate=True, prune=False, all_orientations=False,
+                profile=False, transposition_size=TRANSPOSITION_SIZE, flips=False):
+    """
+    Create a solver for the given strategy name.
+
+    Args:
+        board (HexBoard): The board to fill.
+        pieces (list): The piece objects available to the solver.
+        strategy (str): A key of SOLVER_STRATEGIES.
+        animate (bool): See Solver.__init__.
+        prune (bool): See Solver.__init__.
+        all_orientations (bool): See Solver.__init__.
+        profile (bool): See Solver.__init__.
+        transposition_size (int): See Solver.__init__.
+        flips (bool): See Solver.__init__.
+
+    Returns:
+        Solver: The solver instance.
+    """
+    try:
+        solver_class = SOLVER_STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown solver strategy: {strategy!r}")
+    return solver_class(
+        board, pieces, animate=animate, prune=prune, all_orientations=all_orientations, profile=profile,
+        transposition_size=transposition_size, flips=flips
+    )
+
+
+def copy_pieces(pieces):
+    """
+    Copy the solver-relevant part of piece objects as plain data.
+
+    Useful to hand pieces to another thread or process: GUI pieces also carry
+    pygame objects and screen state that the solver does not need.
+
+    Args:
+        pieces (list): Piece objects.
+
+    Returns:
+        list: New piece dictionaries with 'id', 'shape', 'anchor_parity', 'placed'
+            (and 'grid_pos' for placed pieces).
+    """
+    copies = []
+    for piece in pieces:
+        data = {
+            'id': piece['id'],
+            'shape': list(piece['shape']),
+            'anchor_parity': piece['anchor_parity'],
+            'placed': piece['placed'],
+        }
+        if piece['placed']:
+            data['grid_pos'] = piece['grid_pos']
+        copies.append(data)
+    return copies
+
+
+def shape_balance(shape, parity):
+    """
+    Get the up/down balance of a shape: UP triangles minus DOWN triangles.
+
+    Args:
+        shape (list): Relative (dr, dc) coordinates of the shape.
+        parity (int): Anchor parity of the shape.
+
+    Returns:
+        int: The balance, which is the same for every legal placement.
+    """
+    ups = sum(1 for dr, dc in shape if (parity + dr + dc) % 2 == 0)
+    return 2 * ups - len(shape)
+
+
+def orientations(shape, parity):
+    """
+    Get every distinct rotation and reflection of a polyiamond.
+
+    The 6 rotations by 60 degrees and their mirror images are generated and
+    deduplicated, so symmetric pieces yield fewer than 12 orientations. Each one
+    is normalized like generate_random_pieces does: relative to its top-left-most
+    cell, with the parity of that cell. Results are cached per shape.
+
+    Args:
+        shape (list): Relative (dr, dc) coordinates of the piece.
+        parity (int): Anchor parity of the piece.
+
+    Returns:
+        list: (shape tuple, anchor parity) pairs; the first one is the given orientation.
+    """
+    return _orientations(tuple(sorted(shape)), parity)
+
+
+@functools.lru_cache(maxsize=None)
+def _orientations(shape, parity):
+    # Lattice coordinates: X is the column, Y is three times the height of the
+    # triangle centroid (3r+2 for UP, 3r+1 for DOWN). With the anchor placed at
+    # column `parity`, the origin is a lattice vertex and a 60 degree rotation
+    # around it is the integer map (X, Y) -> ((X - Y) / 2, (3X + Y) / 2).
+    points = [(parity + dc, 3 * dr + (2 if (parity + dr + dc) % 2 == 0 else 1)) for dr, dc in shape]
+
+    result = []
+    seen = set()
+    for mirrored in (False, True):
+        current = [(-x, y) for x, y in points] if mirrored else points
+        for _ in range(6):
+            cells = [(y // 3, x) for x, y in current]
+            ref_row, ref_col = min(cells)
+            normalized = tuple(sorted((r - ref_row, c - ref_col) for r, c in cells))
+            key = (normalized, (ref_row + ref_col) % 2)
+            if key not in seen:
+                seen.add(key)
+                result.append(key)
+            current = [((x - y) // 2, (3 * x + y) // 2) for x, y in current]
+    return result
+
+
+def flip_orientations(shape, parity):
+    """
+    Get the distinct orientations of a polyiamond the player can reach in the GUI:
+    the mirror images across the horizontal axis ((dr, dc) -> (-dr, dc), UP and
+    DOWN swapped) and the vertical axis ((dr, dc) -> (dr, -dc)), and both (a half
+    turn). Normalized like orientations() does.
+
+    Args:
+        shape (list): Relative (dr, dc) coordinates of the piece.
+        parity (int): Anchor parity of the piece.
+
+    Returns:
+        list: (shape tuple, anchor parity) pairs; the first one is the given orientation.
+    """
+    return _flip_orientations(tuple(sorted(shape)), parity)
+
+
+@functools.lru_cache(maxsize=None)
+def _flip_orientations(shape, parity):
+    result = []
+    for row_sign, flipped_parity in ((1, parity), (-1, 1 - parity)):
+        for col_sign in (1, -1):
+            cells = [(row_sign * dr, col_sign * dc) for dr, dc in shape]
+            ref_row, ref_col = min(cells)
+            key = (
+                tuple(sorted((r - ref_row, c - ref_col) for r, c in cells)),
+                (flipped_parity + ref_row + ref_col) % 2,
+            )
+            if key not in result:
+                result.append(key)
+    return result
+
+
+def _bits(mask):
+    """
+    Iterate over the indices of the set bits of a mask, lowest first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def solve_generator(board, pieces, strategy='backtrack', prune=False, all_orientations=False, profile=False,
+                    transposition_size=TRANSPOSITION_SIZE):
+    """
+    Coroutine generator for the solver.
+    Yields control back to the caller after every placement and backtrack,
+    which lets the GUI animate the search.
+
+    Args:
+        board (HexBoard): The board to fill.
+        pieces (list): The piece objects available to the solver.
+        strategy (str): A key of SOLVER_STRATEGIES.
+        prune (bool): Enable dead-region pruning (see Solver.is_dead_end).
+        all_orientations (bool): Let the solver rotate and reflect the pieces.
+        profile (bool): Collect per-depth and per-piece statistics (see SolverStats).
+        transposition_size (int): Capacity of the table of dead states (0 disables it).
+
+    Yields:
+        bool: True if solved, False if continuing search.
+    """
+    return make_solver(
+        board, pieces, strategy, prune=prune, all_orientations=all_orientations, profile=profile,
+        transposition_size=transposition_size
+    ).steps()
+
+
+def count_solutions(board, pieces, limit=None, strategy='backtrack', prune=False, all_orientations=False,
+                    symmetry=False, flips=False):
+    """
+    Count the solutions of a board (see Solver.count_solutions). The board and
+    the pieces are left as they were.
+
+    Args:
+        board (HexBoard): The board to fill.
+        pieces (list): The piece objects available to the solver.
+        limit (int, optional): Stop once this many solutions are found.
+        strategy (str): A key of SOLVER_STRATEGIES.
+        prune (bool): Enable dead-region pruning (see Solver.is_dead_end).
+        all_orientations (bool): Let the solver rotate and reflect the pieces.
+        symmetry (bool): Count tilings equivalent under the board symmetries once.
+        flips (bool): Let the solver mirror the pieces like the player can (see flip_orientations).
+
+    Returns:
+        tuple: (number of solutions, exact) where exact is False if the count
+            stopped at the limit.
+    """
+    solver = make_solver(board, pieces, strategy, animate=False, prune=prune, all_orientations=all_orientations,
+                         flips=flips)
+    count = solver.count_solutions(limit, symmetry=symmetry)
+    return count, solver.stats.exhausted
+
+
+def solve(board, pieces, strategy='backtrack', prune=False, all_orientations=False, profile=False,
+          transposition_size=TRANSPOSITION_SIZE):
+    """
+    Run the solver to completion without yielding to a caller.
+
+    Only bitmasks are touched during the search. On success the board and the
+    pieces are left in the solved state ('placed' and 'grid_pos' set on every piece).
+
+    Args:
+        board (HexBoard): The board to fill.
+        pieces (list): The piece objects available to the solver.
+        strategy (str): A key of SOLVER_STRATEGIES.
+        prune (bool): Enable dead-region pruning (see Solver.is_dead_end).
+        all_orientations (bool): Let the solver rotate and reflect the pieces.
+        profile (bool): Collect per-depth and per-piece statistics (see SolverStats).
+        transposition_size (int): Capacity of the table of dead states (0 disables it).
+
+    Returns:
+        bool: True if a solution was found, False otherwise.
+    """
+    return make_solver(
+        board, pieces, strategy, animate=False, prune=prune, all_orientations=all_orientations, profile=profile,
+        transposition_size=transposition_size
+    ).solve()
@@ -0,0 +1,93 @@
+"""
+Uniform grid spatial index of screen rectangles.
+
+Picking a piece under the mouse used to test the bounding box of every piece,
+on every mouse motion event. SpatialGrid buckets the rectangles by the square
+cells of a uniform grid they overlap, so a point query only looks at the few
+items registered in the cell under the point, however many pieces there are.
+The items returned are candidates: the caller does the exact (pixel) test.
+"""
+
+
+class SpatialGrid:
+    """
+    Items bucketed by the grid cells their rectangle overlaps.
+
+    Attributes:
+        cell_size (int): Side of a grid cell, in pixels. Ideally about the size
+            of the items, so that each one lands in a few cells only.
+    """
+    def __init__(self, cell_size):
+        """
+        Create an empty index.
+
+        Args:
+            cell_size (int): Side of a grid cell, in pixels.
+        """
+        self.cell_size = max(1, int(cell_size))
+        self._buckets = {} # (cell x, cell y) -> list of items
+        self._cells = {} # id(item) -> (item, cells it is registered in)
+
+    def __len__(self):
+        return len(self._cells)
+
+    def clear(self):
+        """
+        Remove every item.
+        """
+        self._buckets.clear()
+        self._cells.clear()
+
+    def _cell_range(self, rect):
+        x, y, w, h = rect
+        size = self.cell_size
+        # The right and bottom edges are exclusive, like pygame.Rect
+        return [
+            (cx, cy)
+            for cx in range(x // size, (x + max(w, 1) - 1) // size + 1)
+            for cy in range(y // size, (y + max(h, 1) - 1) // size + 1)
+        ]
+
+    def insert(self, item, rect):
+        """
+        Register an item, or move it if it is already registered.
+
+        Args:
+            item: Any object (compared by identity).
+            rect (tuple): (x, y, width, height) in integer pixels (a pygame.Rect works).
+        """
+        self.remove(item)
+        cells = self._cell_range(rect)
+        for cell in cells:
+            self._buckets.setdefault(cell, []).append(item)
+        self._cells[id(item)] = (item, cells)
+
+    def remove(self, item):
+        """
+        Unregister an item. Does nothing if it is not registered.
+
+        Args:
+            item: The item.
+        """
+        entry = self._cells.pop(id(item), None)
+        if entry is None:
+            return
+        for cell in entry[1]:
+            bucket = self._buckets[cell]
+            bucket.remove(item)
+            if not bucket:
+                del self._buckets[cell]
+
+    def query(self, x, y):
+        """
+        Get the items whose rectangle may contain a point.
+
+        Args:
+            x (int): Screen x coordinate.
+            y (int): Screen y coordinate.
+
+        Returns:
+            list: The items registered in the cell of the point, in insertion order.
+        """
+        size = self.cell_size
+        return self._buckets.get((int(x) // size, int(y) // size), [])
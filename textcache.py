@@ -0,0 +1,71 @@
+"""
+Cache of rendered text surfaces.
+
+Rasterizing text with pygame.font is one of the most expensive calls of a
+frame, and the HUD mostly shows the same strings frame after frame. TextCache
+keeps the rendered surfaces keyed by (font, text, color, background) and drops
+the least recently used ones once it is full, so changing strings (counters,
+timers) cannot make it grow without bound.
+"""
+import collections
+
+TEXT_CACHE_SIZE = 128 # Rendered strings kept by default
+
+
+class TextCache:
+    """
+    Least recently used cache of font.render() results.
+
+    Attributes:
+        capacity (int): Maximum number of cached surfaces.
+        hits (int): Lookups served from the cache.
+        misses (int): Lookups that had to render.
+    """
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        """
+        Create an empty cache.
+
+        Args:
+            capacity (int): Maximum number of cached surfaces.
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def clear(self):
+        """
+        Drop every cached surface.
+        """
+        self._surfaces.clear()
+
+    def render(self, font, text, color, background=None):
+        """
+        Get the surface of a string, rendering it only if it is not cached.
+
+        The returned surface is shared: blit it, do not draw on it.
+
+        Args:
+            font (pygame.font.Font): Font to render with.
+            text (str): The string.
+            color (tuple): RGB text color.
+            background (tuple, optional): RGB background color (transparent if None).
+
+        Returns:
+            pygame.Surface: The antialiased text.
+        """
+        key = (font, text, color, background)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color, background)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.capacity:
+            self._surfaces.popitem(last=False)
+        return surface